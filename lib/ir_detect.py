@@ -0,0 +1,100 @@
+# ir_detect.py Table driven IR protocol classifier.
+# Pure Python without machine/utime imports, so the same table is used by
+# IR_DUMP on the Pico and by the analyzer tools on the host.
+
+UNKNOWN = 0
+NEC = 1
+AEHA = 2
+SONY = 3
+RC5 = 4
+RC6 = 5
+MCE = 6
+SAMSUNG = 7
+
+NAMES = ('unknown', 'nec', 'aeha', 'sony', 'rc5', 'rc6', 'mce', 'samsung')
+
+# A space at least this long ends a burst (IrSignalAnalyzer._FRAME_END_GAP_US)
+BURST_GAP = 8000
+
+# Leader mark/space in units of T. NEC and AEHA are the NecLeaderPartElement
+# and AehaLeaderPartElement timings of the analyzer, RC-6 is the nominal
+# RC6_M0.hdr (2666, 889). A leader space of 0 is not checked (RC-5 starts
+# with a bi-phase bit). A repeat space of 0 means there is no repeat code.
+# (protocol, T us, leader mark, leader space, repeat space, min edges, max edges)
+PROTOCOLS = (
+    (NEC, 562, 16, 8, 4, 68, 68),
+    (AEHA, 425, 8, 4, 8, 99, 1400),
+    (SONY, 600, 4, 1, 0, 26, 42),
+    (RC5, 889, 1, 0, 0, 14, 28),
+    (RC6, 444, 6, 2, 0, 22, 44),
+    (MCE, 500, 4, 2, 0, 14, 34),
+    (SAMSUNG, 560, 8, 8, 0, 68, 68),
+)
+
+# Repeat codes are a leader followed by a single stop mark
+_REPEAT_EDGES = 4
+# Leader mark and leader space must both match
+_MIN_SCORE = 4
+
+def _window(v, rate):
+    return (v - v // rate, v + v // rate)
+
+# Integer [lo, hi] windows, computed once: +-20% for leaders, +-50% for the
+# mean data mark.
+def _windows():
+    w = []
+    for proto, t, mark, space, rep, emin, emax in PROTOCOLS:
+        w.append((proto,) + _window(t * mark, 5) + _window(t * space, 5)
+                 + _window(t * rep, 5) + _window(t, 2) + (emin, emax))
+    return tuple(w)
+
+_WINDOWS = _windows()
+
+def _score(nedges, mark, space, msum, mcount):
+    best = UNKNOWN
+    best_score = _MIN_SCORE - 1
+    for proto, mlo, mhi, slo, shi, rlo, rhi, tlo, thi, emin, emax in _WINDOWS:
+        if not mlo <= mark <= mhi:
+            continue
+        score = 2
+        repeat = rhi > 0 and rlo <= space <= rhi
+        if shi == 0 or slo <= space <= shi or repeat:
+            score += 2
+        if emin <= nedges <= emax or (repeat and nedges <= _REPEAT_EDGES):
+            score += 1
+        if mcount and tlo * mcount <= msum <= thi * mcount:
+            score += 1
+        if score > best_score:
+            best = proto
+            best_score = score
+    return best
+
+# Return the protocol of the first burst in times[first:first + nedges] that
+# matches the table, or UNKNOWN. diff(a, b) is the time from edge b to edge a:
+# pass utime.ticks_diff on the Pico and operator.sub for plain offsets. With
+# diff None times holds the gaps between the edges (the IR_RX compact store).
+# One pass over the edges; the table is only scored at burst boundaries.
+def classify(times, nedges, diff, first=0):
+    start = first
+    end = first + nedges
+    mark = space = msum = mcount = 0
+    for x in range(first, end - 1):
+        width = diff(times[x + 1], times[x]) if diff else times[x]
+        k = x - start
+        if k & 1:
+            if k == 1:
+                space = width
+            if width >= BURST_GAP:
+                proto = _score(x + 1 - start, mark, space, msum, mcount)
+                if proto != UNKNOWN:
+                    return proto
+                start = x + 1
+                mark = space = msum = mcount = 0
+        elif k == 0:
+            mark = width
+        else:
+            msum += width
+            mcount += 1
+    if end - start < 2:
+        return UNKNOWN
+    return _score(end - start, mark, space, msum, mcount)
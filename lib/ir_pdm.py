@@ -0,0 +1,130 @@
+# ir_pdm.py Table driven pulse distance decoder for NEC and AEHA frames.
+# A protocol is a declarative spec that is compiled once into integer
+# windows. decode() then runs a single loop over an edge array with no float
+# math and no per-bit method calls. Like ir_detect this has no machine
+# dependency: it drives ir_rx.pdm on the Pico and the analyzer tools on the host.
+
+# Spec: (T us, leader mark T, leader space T, repeat space T, field bits, trailer us)
+# A field of 0 bits is variable length byte data that ends at the first space
+# of at least trailer us. Bits are stored MSB first in the order received.
+NEC = (562, 16, 8, 4, (16, 8, 8), 0)
+AEHA = (425, 8, 4, 8, (16, 4, 4, 0), 8000)
+
+# Every window is nominal +-1/_RATE (20%), the analyzer's _WARNING_ERROR_RATE
+_RATE = 5
+
+# Decoder states
+_SEEK = 0    # Waiting for a leader mark
+_LEADER = 1  # Current pulse follows a leader mark, its gap is the leader space
+_BITS = 2    # Fixed length fields
+_DATA = 3    # Variable length data up to the trailer
+
+def _window(v):
+    return v - v // _RATE, v + v // _RATE
+
+class PulseDistanceDecoder():
+    # callback(decoder, repeat) runs for every decoded frame (repeat False) and
+    # every repeat code (repeat True). On a frame, fields[i] holds counts[i]
+    # bits of fixed field i and data[:(nbits + 7) // 8] holds nbits of variable
+    # data. The last data byte holds nbits % 8 bits if that is not 0.
+    def __init__(self, spec, callback, maxbytes=64):
+        t, mark, space, rep, widths, trailer = spec
+        self.callback = callback
+        self._mlo, self._mhi = _window(t * mark)
+        self._slo, self._shi = _window(t * space)
+        self._rlo, self._rhi = _window(t * rep)
+        self._blo, self._bhi = _window(t)  # bit 0 space, anything else is a 1
+        self._trailer = trailer
+        self._has_data = 0 in widths
+        self._widths = bytes(w for w in widths if w)
+        self.fields = [0] * len(self._widths)
+        self.counts = bytearray(len(self._widths))
+        self.data = bytearray(maxbytes)
+        self.nbits = 0
+        self.reset()
+
+    def reset(self):
+        self._state = _SEEK
+        self._field = 0
+        self._last = None  # Falling edge of the previous pulse
+
+    # Decode times[first:first + nedges]. Even offsets from first are rising
+    # edges of the IR signal (start of a mark). diff(a, b) is the time from b to a. State carries over
+    # between calls, so an edge stream can be decoded in chunks. With diff None
+    # times[x] is the gap from edge x to x + 1 (the IR_RX compact store) and
+    # the times are decoded in one call.
+    def decode(self, times, nedges, diff, first=0):
+        mlo = self._mlo; mhi = self._mhi
+        slo = self._slo; shi = self._shi
+        rlo = self._rlo; rhi = self._rhi
+        blo = self._blo; bhi = self._bhi
+        widths = self._widths; fields = self.fields; counts = self.counts
+        nfields = len(widths)
+        state = self._state
+        field = self._field
+        last = self._last
+        x = first
+        end = first + nedges
+        while x < end:
+            if diff is None:
+                mark = times[x] if x + 1 < end else -1
+                gap = times[x - 1] if x > first else 0
+            else:
+                t0 = times[x]
+                if x + 1 < end:
+                    fall = times[x + 1]
+                    mark = diff(fall, t0)
+                else:  # Signal has never fallen
+                    fall = t0 - 1
+                    mark = -1
+                gap = diff(t0, last) if last is not None else 0
+                last = fall
+            x += 2
+            if state == _SEEK:
+                if mlo <= mark <= mhi:
+                    state = _LEADER
+            elif state == _LEADER:
+                if rlo <= gap <= rhi and not slo <= gap <= shi:
+                    state = _SEEK
+                    self.callback(self, True)
+                else:  # An unexpected leader space still starts a frame
+                    state = _BITS
+                    field = 0
+                    for i in range(nfields):
+                        fields[i] = 0
+                        counts[i] = 0
+                    self.nbits = 0
+            elif state == _BITS:
+                fields[field] = (fields[field] << 1) | (0 if blo <= gap <= bhi else 1)
+                counts[field] += 1
+                if counts[field] == widths[field]:
+                    field += 1
+                    if field == nfields:
+                        if self._has_data:
+                            state = _DATA
+                        else:
+                            self.callback(self, False)
+                            state = _LEADER if mlo <= mark <= mhi else _SEEK
+            elif gap >= self._trailer or gap < 0:  # _DATA, < 0 is a new capture on the host
+                self.callback(self, False)
+                state = _LEADER if mlo <= mark <= mhi else _SEEK
+            else:
+                nbits = self.nbits
+                i = nbits >> 3
+                if i == len(self.data):
+                    self.data.append(0)  # Only allocates beyond maxbytes
+                if nbits & 7:
+                    self.data[i] = ((self.data[i] << 1) | (0 if blo <= gap <= bhi else 1)) & 0xff
+                else:
+                    self.data[i] = 0 if blo <= gap <= bhi else 1
+                self.nbits = nbits + 1
+        self._state = state
+        self._field = field
+        self._last = last
+
+    # End of input: deliver a frame cut short once its first field is complete.
+    def end(self):
+        if (self._state == _BITS and self.counts[0] == self._widths[0]) or self._state == _DATA:
+            self.callback(self, False)
+        self._state = _SEEK
+        self._field = 0
@@ -6,7 +6,7 @@
 
 from machine import Timer, Pin
 from array import array
-from utime import ticks_us
+from utime import ticks_us, ticks_diff, ticks_add
 
 # Save RAM
 # from micropython import alloc_emergency_exception_buf
@@ -18,6 +18,24 @@ from utime import ticks_us
 # the worst case block transmission time, but be less than the interval between
 # a block start and a repeat code start (~108ms depending on protocol)
 
+# Compact edge store: _times is array('H') of the gaps between edges, so
+# _times[x] is the time from edge x to edge x + 1. A gap of _ESCAPE us or more
+# is stored as _ESCAPE and its exact value in a table after the gaps:
+# _times[nedges] is the number of entries, each (index, high, low 16 bits).
+_ESCAPE = 0xffff
+_LONG_GAPS = 8
+
+# Statistics (stats()): slots of one array, so the timer callback counts
+# without allocating. A capture ends when its timer callback reset edge to 0.
+_EDGES = 0  # Edges of all ended captures
+_CAPTURES = 1
+_FRAMES = 2  # Results passed to the callback (IR_DUMP: frames queued)
+_NOISE = 3  # Captures of fewer than 3 edges
+_OVERRUNS = 4  # Captures that filled the buffer
+_DECODE_MAX = 5  # us
+_CODES = 6  # Count of each result code, REPEAT to BADADDR
+_HISTOGRAM = _CODES + 7  # Decode durations, one bucket per DECODE_BUCKETS_US + the rest
+
 class IR_RX():
     # Result/error codes
     # Repeat button code
@@ -30,6 +48,13 @@ class IR_RX():
     BADDATA = -6
     BADADDR = -7
 
+    # Set True (on IR_RX or a subclass) before construction for the compact
+    # edge store: half the RAM per edge, gaps measured once at capture time.
+    compact = False
+
+    # Upper bounds (us) of the decode duration histogram buckets
+    DECODE_BUCKETS_US = (50, 100, 200, 500, 1000, 2000, 5000)
+
     def __init__(self, pin, nedges, tblock, callback, *args):  # Optional args for callback
         self._pin = pin
         self._nedges = nedges
@@ -39,11 +64,85 @@ class IR_RX():
         self._errf = lambda _ : None
         self.verbose = False
 
-        self._times = array('i',  (0 for _ in range(nedges + 1)))  # +1 for overrun
-        pin.irq(handler = self._cb_pin, trigger = (Pin.IRQ_FALLING | Pin.IRQ_RISING))
+        self.set_store(self.compact)
+        self._times = self.new_buffer()
+        self._start = 0  # Edge of _times that width(0) starts at, see IR_MULTI
+        self._stats = array('I', (0 for _ in range(_HISTOGRAM + len(self.DECODE_BUCKETS_US) + 1)))
+        self._t0 = 0  # Compact store: ticks_us() of the first and last edge
+        self._tlast = 0
+        self._tprev = 0  # Glitch filter: ticks_us() of the edge before the last
+        self._min_pulse = 0
+        self._min_leader = 0
         self.edge = 0
         self.tim = Timer(-1)  # Sofware timer
-        self.cb = self.decode
+        self.cb = self._end_capture
+        if hasattr(pin, 'attach'):  # A capture backend such as ir_rx.pio fills _times itself
+            pin.attach(self)
+        else:
+            pin.irq(handler = self._irq_handler(), trigger = (Pin.IRQ_FALLING | Pin.IRQ_RISING))
+
+    def _irq_handler(self):
+        if self._min_pulse or self._min_leader:
+            return self._cb_pin_filtered
+        return self._cb_pin_compact if self.compact else self._cb_pin
+
+    # Glitch filter in the capture path, off by default. A mark or space
+    # shorter than min_pulse_us is removed with both its edges, which merges
+    # it into the pulses around it. A capture (and its block timer) only
+    # starts once the first mark lasted min_leader_us. Keep both below the
+    # shortest symbol in use: RC-5 starts with a 889us mark.
+    def set_filter(self, min_pulse_us=0, min_leader_us=0):
+        if hasattr(self._pin, 'attach'):
+            raise ValueError('the capture backend does not filter edges')
+        self._min_pulse = min_pulse_us
+        self._min_leader = min_leader_us
+        self._pin.irq(handler = self._irq_handler(), trigger = (Pin.IRQ_FALLING | Pin.IRQ_RISING))
+
+    # Edge store accessors. Decoders read edges only through these, so they
+    # work on either store. The bound methods are stored once, calling them
+    # does not allocate.
+    def set_store(self, compact):
+        self.compact = compact
+        self.width = self._width_compact if compact else self._width
+        self.interval = self._interval_compact if compact else self._interval
+
+    # A capture buffer for nedges + 1 edges (+1 for overrun)
+    def new_buffer(self):
+        if self.compact:
+            return array('H', (0 for _ in range(self._nedges + 1 + 3 * _LONG_GAPS)))
+        return array('i', (0 for _ in range(self._nedges + 1)))
+
+    # width(x): us from edge x to edge x + 1 of the current capture, counted
+    # from _start. The compact store caps it at 65535, far beyond any
+    # protocol's symbols.
+    def _width(self, x):
+        times = self._times
+        x += self._start
+        return ticks_diff(times[x + 1], times[x])
+
+    def _width_compact(self, x):
+        return self._times[self._start + x]
+
+    # interval(times, x): the exact us from edge x to edge x + 1 of a capture
+    # buffer, e.g. one IR_DUMP has handed over.
+    def _interval(self, times, x):
+        return ticks_diff(times[x + 1], times[x])
+
+    def _interval_compact(self, times, x):
+        gap = times[x]
+        if gap == _ESCAPE:
+            n = self._nedges
+            for i in range(n + 1, n + 1 + 3 * times[n], 3):
+                if times[i] == x:
+                    return (times[i + 1] << 16) | times[i + 2]
+        return gap
+
+    # ticks_us() of the first and the last edge of the current capture
+    def first_ticks(self):
+        return self._t0 if self.compact else self._times[0]
+
+    def last_ticks(self):
+        return self._tlast if self.compact else self._times[self.edge - 1]
 
     # Pin interrupt. Save time of each edge for later decode.
     def _cb_pin(self, line):
@@ -55,12 +154,154 @@ class IR_RX():
             self._times[self.edge] = t
             self.edge += 1
 
+    def _cb_pin_compact(self, line):
+        t = ticks_us()
+        edge = self.edge
+        if edge <= self._nedges:
+            times = self._times
+            if not edge:
+                self.tim.init(period=self._tblock , mode=Timer.ONE_SHOT, callback=self.cb)
+                self._t0 = t
+                times[self._nedges] = 0  # No long gaps yet
+            else:
+                gap = ticks_diff(t, self._tlast)
+                if gap >= _ESCAPE:
+                    self._long_gap(times, edge - 1, gap)
+                    gap = _ESCAPE
+                times[edge - 1] = gap
+            self._tlast = t
+            self.edge = edge + 1
+
+    def _long_gap(self, times, x, gap):
+        n = self._nedges
+        i = times[n]
+        if i < _LONG_GAPS:
+            i = n + 1 + 3 * i
+            times[i] = x
+            times[i + 1] = gap >> 16
+            times[i + 2] = gap & 0xffff
+            times[n] += 1
+
+    # Pin interrupt with the glitch filter, for either edge store
+    def _cb_pin_filtered(self, line):
+        t = ticks_us()
+        edge = self.edge
+        if edge > self._nedges:
+            return
+        times = self._times
+        compact = self.compact
+        if edge:
+            width = ticks_diff(t, self._tlast)
+            if edge == 1 and width < self._min_leader:
+                self.edge = 0  # Too short for a leader
+                return
+            if width < self._min_pulse:
+                # Drop the glitch: forget the edge that started it, ignore this one
+                edge -= 1
+                self.edge = edge
+                if not edge:
+                    self.tim.deinit()
+                    return
+                if compact:
+                    if times[edge - 1] == _ESCAPE:
+                        # Its long gap is the last table entry, unless the table was full
+                        n = self._nedges
+                        i = times[n]
+                        if i and times[n + 3 * i - 2] == edge - 1:
+                            times[n] = i - 1
+                    self._tlast = self._tprev
+                    self._tprev = ticks_add(self._tprev, -self._interval_compact(times, edge - 2)) if edge > 1 else 0
+                else:
+                    self._tlast = times[edge - 1]
+                    self._tprev = times[edge - 2] if edge > 1 else 0
+                return
+            if edge == 1 and self._min_leader:
+                # The block started at the first edge
+                self.tim.init(period=max(1, self._tblock - width // 1000), mode=Timer.ONE_SHOT, callback=self.cb)
+            if compact:
+                if width >= _ESCAPE:
+                    self._long_gap(times, edge - 1, width)
+                    width = _ESCAPE
+                times[edge - 1] = width
+        else:
+            if not self._min_leader:
+                self.tim.init(period=self._tblock , mode=Timer.ONE_SHOT, callback=self.cb)
+            if compact:
+                self._t0 = t
+                times[self._nedges] = 0
+        if not compact:
+            times[edge] = t
+        self._tprev = self._tlast
+        self._tlast = t
+        self.edge = edge + 1
+
+    # Timer callback that ends a capture: decode() and count it. Subclasses
+    # whose timer callback waits for the end of a capture call this, not
+    # decode(), once it has ended, so the histogram holds only decodes. A
+    # callback that leaves edge set has not ended the capture and is not counted.
+    def _end_capture(self, t):
+        nedges = self.edge
+        t0 = ticks_us()
+        self.decode(t)
+        dt = ticks_diff(ticks_us(), t0)
+        if self.edge:
+            return  # Still capturing: not a decode
+        stats = self._stats
+        if dt > stats[_DECODE_MAX]:
+            stats[_DECODE_MAX] = dt
+        i = _HISTOGRAM
+        for limit in self.DECODE_BUCKETS_US:
+            if dt < limit:
+                break
+            i += 1
+        stats[i] += 1
+        stats[_CAPTURES] += 1
+        stats[_EDGES] += nedges
+        if nedges < 3:
+            stats[_NOISE] += 1
+        elif nedges > self._nedges:
+            stats[_OVERRUNS] += 1
+
+    # Count a result passed to the callback: a frame, or a code like REPEAT
+    def _frame(self, code=0):
+        stats = self._stats
+        stats[_FRAMES] += 1
+        if code < 0:
+            stats[_CODES - 1 - code] += 1
+
+    # Report an error code (or REPEAT) to the error function
+    def _error(self, code):
+        self._stats[_CODES - 1 - code] += 1
+        self._errf(code)
+
+    # Counters since construction or the last reset_stats(). errors maps a
+    # result code to its count, decode_us has the count of decode durations
+    # below each DECODE_BUCKETS_US bound, the last entry those above.
+    def stats(self):
+        s = self._stats
+        return {'edges': s[_EDGES], 'captures': s[_CAPTURES], 'frames': s[_FRAMES],
+                'noise': s[_NOISE], 'overruns': s[_OVERRUNS], 'decode_max_us': s[_DECODE_MAX],
+                'errors': {-1 - i: s[_CODES + i] for i in range(_HISTOGRAM - _CODES) if s[_CODES + i]},
+                'decode_us': list(s[_HISTOGRAM:])}
+
+    def reset_stats(self):
+        stats = self._stats
+        for i in range(len(stats)):
+            stats[i] = 0
+
+    # Timer callbacks can run as hard IRQs (as on rp2), where the heap must not
+    # be touched: decoders report errors through return codes instead of
+    # raising, and a call without extra args does not build an args tuple.
     def do_callback(self, cmd, addr, ext, thresh=0):
         self.edge = 0
         if cmd >= thresh:
-            self.callback(cmd, addr, ext, *self.args)
+            self._frame(cmd)
+            if self.args:
+                self.callback(cmd, addr, ext, *self.args)
+            else:
+                self.callback(cmd, addr, ext)
         else:
-            self._errf(cmd)
+            self._error(cmd)
 
     def error_function(self, func):
         self._errf = func
@@ -7,34 +7,46 @@
 
 from machine import Pin, freq
 from sys import platform
+from array import array
 
-from utime import sleep_ms, ticks_us, ticks_diff
+from utime import sleep_ms, ticks_us
 from ir_rx import IR_RX
 
 
+def near(v, target):
+    return target * 0.8 < v < target * 1.2
+
+
 class IR_GET(IR_RX):
     def __init__(self, pin, nedges=100, twait=100, display=True):
         self.display = display
         super().__init__(pin, nedges, twait, lambda *_ : None)
+        self._burst = array('i', (0 for _ in range(nedges)))
+        self._nburst = 0
         self.data = None
 
     def decode(self, _):
-        def near(v, target):
-            return target * 0.8 < v < target * 1.2
         lb = self.edge - 1  # Possible length of burst
         if lb < 3:
             return  # Noise
-        burst = []
+        burst = self._burst
+        width_of = self.width
+        n = 0
         for x in range(lb):
-            dt = ticks_diff(self._times[x + 1], self._times[x])
+            dt = width_of(x)
             if x > 0 and dt > 10000:  # Reached gap between repeats
                 break
-            burst.append(dt)
-        lb = len(burst)  # Actual length
+            burst[n] = dt
+            n += 1
+        lb = n  # Actual length
         # Duration of pulse train 24892 for RC-5 22205 for RC-6
-        duration = ticks_diff(self._times[lb - 1], self._times[0])
+        duration = 0
+        for x in range(lb - 1):
+            duration += burst[x]
 
+        # Only the display allocates: it prints from the timer callback
         if self.display:
+            burst = burst[:lb]
             for x, e in enumerate(burst):
                 print('{:03d} {:5d}'.format(x, e))
             print()
@@ -82,14 +94,15 @@ class IR_GET(IR_RX):
                 print('Unknown protocol start {} {} Burst length {} duration {}'.format(burst[0], burst[1], lb, duration))
 
             print()
-        self.data = burst
+        self._nburst = lb
         # Set up for new data burst. Run null callback
         self.do_callback(0, 0, 0)
 
     def acquire(self):
-        while self.data is None:
+        while not self._nburst:
             sleep_ms(5)
         self.close()
+        self.data = list(self._burst[:self._nburst])
         return self.data
 
 def test():
@@ -6,7 +6,7 @@
 
 # WARNING: This is experimental and subject to change.
 
-from utime import ticks_us, ticks_diff
+from utime import ticks_us
 from ir_rx import IR_RX
 
 class MCE(IR_RX):
@@ -14,55 +14,62 @@ class MCE(IR_RX):
     def __init__(self, pin, callback, *args):
         # Block lasts ~19ms and has <= 34 edges
         super().__init__(pin, 34, 25, callback, *args)
+        self._val = 0
+        self._addr = 0
+        self._ctrl = 0
 
     def decode(self, _):
-        def check(v):
-            if self.init_cs == -1:
-                return True
-            csum = v >> 12
-            cs = self.init_cs
-            for _ in range(12):
-                if v & 1:
-                    cs += 1
-                v >>= 1
-            return cs == csum
+        err = self._decode(self.edge)
+        # Set up for new data burst and run user callback/error function
+        if err:
+            self.do_callback(err, 0, 0)
+        else:
+            self.do_callback(self._val, self._addr, self._ctrl)
 
-        try:
-            t0 = ticks_diff(self._times[1], self._times[0])  # 2000μs mark
-            t1 = ticks_diff(self._times[2], self._times[1])  # 1000μs space
-            if not ((1800 < t0 < 2200) and (800 < t1 < 1200)):
-                raise RuntimeError(self.BADSTART)
-            nedges = self.edge  # No. of edges detected
-            if not 14 <= nedges <= 34:
-                raise RuntimeError(self.OVERRUN if nedges > 28 else self.BADSTART)
-            # Manchester decode
-            mask = 1
-            bit = 1
-            v = 0
-            x = 2
-            for _ in range(16):
-                # -1 convert count to index, -1 because we look ahead
-                if x > nedges - 2:
-                    raise RuntimeError(self.BADBLOCK)
-                # width is 500/1000 nominal
-                width = ticks_diff(self._times[x + 1], self._times[x])
-                if not 250 < width < 1350:
-                    self.verbose and print('Bad block 3 Width', width, 'x', x)
-                    raise RuntimeError(self.BADBLOCK)
-                short = int(width < 750)
-                bit ^= short ^ 1
-                v |= mask if bit else 0
-                mask <<= 1
-                x += 1 + short
+    def _check(self, v):
+        if self.init_cs == -1:
+            return True
+        csum = v >> 12
+        cs = self.init_cs
+        for _ in range(12):
+            if v & 1:
+                cs += 1
+            v >>= 1
+        return cs == csum
 
-            self.verbose and print(bin(v))
-            if not check(v):
-                raise RuntimeError(self.BADDATA)
-            val = (v >> 6) & 0x3f
-            addr = v & 0xf  # Constant for all buttons on my remote
-            ctrl = (v >> 4) & 3
+    # Return 0 and the fields in _val, _addr, _ctrl or an error code
+    def _decode(self, nedges):  # No. of edges detected
+        width_of = self.width
+        t0 = width_of(0)  # 2000μs mark
+        t1 = width_of(1)  # 1000μs space
+        if not ((1800 < t0 < 2200) and (800 < t1 < 1200)):
+            return self.BADSTART
+        if not 14 <= nedges <= 34:
+            return self.OVERRUN if nedges > 28 else self.BADSTART
+        # Manchester decode
+        mask = 1
+        bit = 1
+        v = 0
+        x = 2
+        for _ in range(16):
+            # -1 convert count to index, -1 because we look ahead
+            if x > nedges - 2:
+                return self.BADBLOCK
+            # width is 500/1000 nominal
+            width = width_of(x)
+            if not 250 < width < 1350:
+                self.verbose and print('Bad block 3 Width', width, 'x', x)
+                return self.BADBLOCK
+            short = 1 if width < 750 else 0
+            bit ^= short ^ 1
+            v |= mask if bit else 0
+            mask <<= 1
+            x += 1 + short
 
-        except RuntimeError as e:
-            val, addr, ctrl = e.args[0], 0, 0
-        # Set up for new data burst and run user callback/error function
-        self.do_callback(val, addr, ctrl)
+        self.verbose and print(bin(v))
+        if not self._check(v):
+            return self.BADDATA
+        self._val = (v >> 6) & 0x3f
+        self._addr = v & 0xf  # Constant for all buttons on my remote
+        self._ctrl = (v >> 4) & 3
+        return 0
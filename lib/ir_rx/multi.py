@@ -0,0 +1,117 @@
+# multi.py Decode several IR protocols from a single receiver pin.
+# IR_MULTI owns the pin IRQ and the timer. It captures edges once into a
+# shared buffer, splits them into bursts and offers every burst to the
+# registered decoders, the ones ir_detect.classify() picks first.
+
+from machine import Timer
+from utime import ticks_us, ticks_diff
+from ir_rx import IR_RX
+import ir_detect
+
+# ir_detect protocol of each decoder class. Others are tried last.
+_PROTOCOLS = {
+    'NEC_8': ir_detect.NEC,
+    'NEC_16': ir_detect.NEC,
+    'NEC_PDM': ir_detect.NEC,
+    'AEHA': ir_detect.AEHA,
+    'SONY_12': ir_detect.SONY,
+    'SONY_15': ir_detect.SONY,
+    'SONY_20': ir_detect.SONY,
+    'RC5_IR': ir_detect.RC5,
+    'RC6_M0': ir_detect.RC6,
+    'MCE': ir_detect.MCE,
+}
+
+# Stands in for the pin of a registered decoder: its IRQ is never enabled
+class _NoPin():
+    def irq(self, handler=None, trigger=0):
+        pass
+
+class IR_MULTI(IR_RX):
+    # A capture ends once no edge arrived for _IDLE_MS, which is longer than
+    # the longest leader mark (NEC 9ms). It is split into bursts at spaces of
+    # at least ir_detect.BURST_GAP, so a decoder gets a frame or a repeat code
+    # as it would see it on its own pin.
+    _IDLE_MS = 12
+    _NUM_OF_EDGES = 700
+
+    def __init__(self, pin, nedges=_NUM_OF_EDGES):
+        super().__init__(pin, nedges, IR_MULTI._IDLE_MS, None)
+        self._idle_us = IR_MULTI._IDLE_MS * 1000
+        self.cb = self._check_idle
+        self._decoders = []
+        self._protocols = bytearray()
+        self._err = 0
+
+    # Register a decoder: cls is any IR_RX subclass, constructed with the
+    # usual callback and args. Returns the decoder, e.g. to set verbose.
+    def add(self, cls, callback, *args):
+        rx = cls(_NoPin(), callback, *args)
+        rx.tim.deinit()
+        rx.set_store(self.compact)
+        rx._times = self._times  # Drop its own edge buffer
+        rx._errf = self._on_error
+        self._decoders.append(rx)
+        self._protocols.append(_PROTOCOLS.get(cls.__name__, ir_detect.UNKNOWN))
+        return rx
+
+    # Rearm the timer until the pin was idle for _idle_us like IR_DUMP
+    def _check_idle(self, _):
+        nedges = self.edge
+        if nedges <= self._nedges:
+            idle = ticks_diff(ticks_us(), self.last_ticks())
+            if idle < self._idle_us:
+                self.tim.init(period=(self._idle_us - idle) // 1000 + 1, mode=Timer.ONE_SHOT, callback=self.cb)
+                return
+        self._end_capture(None)
+
+    def decode(self, _):
+        nedges = self.edge
+        width_of = self.width
+        start = 0
+        # Even indices start a mark, so a space ends at an even index
+        for x in range(2, nedges, 2):
+            if width_of(x - 1) >= ir_detect.BURST_GAP:
+                self._dispatch(start, x)
+                start = x
+        self._dispatch(start, nedges)
+        self.edge = 0
+
+    # Offer _times[start:end] to the decoders of the detected protocol, then to
+    # the rest in the order they were added. The first one that reports no
+    # error claims the burst. Otherwise the first error goes to the error
+    # function.
+    def _dispatch(self, start, end):
+        n = end - start
+        if n < 3:
+            return  # Noise, not an IR signal
+        # Decoders read the burst from _start on, so no slice is allocated
+        proto = ir_detect.classify(self._times, n, None if self.compact else ticks_diff, start)
+        decoders = self._decoders
+        protocols = self._protocols
+        err = 0
+        for matched in (True, False):
+            for i in range(len(decoders)):
+                if (protocols[i] == proto) != matched:
+                    continue
+                rx = decoders[i]
+                rx._start = start
+                # Never more edges than the decoder could have captured itself
+                rx.edge = n if n <= rx._nedges else rx._nedges + 1
+                self._err = 0
+                rx.decode(None)
+                if not self._err:
+                    self._frame()
+                    return
+                if not err:
+                    err = self._err
+        if err:
+            self._error(err)
+
+    def _on_error(self, code):
+        self._err = code
+
+    def close(self):
+        for rx in self._decoders:
+            rx.close()
+        super().close()
@@ -5,7 +5,7 @@
 # Author: Peter Hinch
 # Copyright Peter Hinch 2020 Released under the MIT license
 
-from utime import ticks_us, ticks_diff
+from utime import ticks_us
 from ir_rx import IR_RX
 
 class NEC_ABC(IR_RX):
@@ -19,10 +19,10 @@ class NEC_ABC(IR_RX):
         try:
             if self.edge > 68:
                 raise RuntimeError(self.OVERRUN)
-            width = ticks_diff(self._times[1], self._times[0])
+            width = self.width(0)
             if width < 4000:  # 9ms leading mark for all valid data
                 raise RuntimeError(self.BADSTART)
-            width = ticks_diff(self._times[2], self._times[1])
+            width = self.width(1)
             if width > 3000:  # 4.5ms space for normal data
                 if self.edge < 68:  # Haven't received the correct number of edges
                     raise RuntimeError(self.BADBLOCK)
@@ -30,9 +30,10 @@ class NEC_ABC(IR_RX):
                 # Space is 1.6875ms (1) or 562.5µs (0)
                 # Skip last bit which is always 1
                 val = 0
+                width_of = self.width
                 for edge in range(3, 68 - 2, 2):
                     val >>= 1
-                    if ticks_diff(self._times[edge + 1], self._times[edge]) > 1120:
+                    if width_of(edge) > 1120:
                         val |= 0x80000000
             elif width > 1700: # 2.5ms space for a repeat code. Should have exactly 4 edges.
                 raise RuntimeError(self.REPEAT if self.edge == 4 else self.BADREP)  # Treat REPEAT as error.
@@ -0,0 +1,47 @@
+# pdm.py Decoder for IR remote control using synchronous code
+# Supports pulse distance protocols (NEC, AEHA) described by an ir_pdm spec.
+# The spec and the decode loop are shared with the host analyzer tools.
+
+from utime import ticks_diff
+from ir_rx import IR_RX
+import ir_pdm
+
+class PDM_IR(IR_RX):
+    # The user callback is called as callback(fields, data, nbits, *args)
+    # for every frame in the block. fields holds the fixed fields MSB first,
+    # data[:(nbits + 7) // 8] the variable length data (AEHA). For a repeat
+    # code nbits is IR_RX.REPEAT. Buffers are reused: copy what you keep.
+    def __init__(self, pin, spec, nedges, tblock, callback, *args):
+        self._decoder = ir_pdm.PulseDistanceDecoder(spec, self._on_frame)
+        self._nframes = 0
+        super().__init__(pin, nedges, tblock, callback, *args)
+
+    def decode(self, _):
+        nedges = self.edge
+        if nedges > self._nedges:
+            self._error(self.OVERRUN)  # Decode what fitted in the buffer
+            nedges = self._nedges
+        self._nframes = 0
+        d = self._decoder
+        d.reset()
+        d.decode(self._times, nedges, None if self.compact else ticks_diff, self._start)
+        d.end()
+        if not self._nframes:
+            self._error(self.BADSTART)
+        # Set up for new data burst
+        self.edge = 0
+
+    def _on_frame(self, decoder, repeat):
+        self._nframes += 1
+        self._frame(self.REPEAT if repeat else 0)
+        self.callback(decoder.fields, decoder.data, self.REPEAT if repeat else decoder.nbits, *self.args)
+
+class NEC_PDM(PDM_IR):
+    def __init__(self, pin, callback, *args):
+        # Block lasts <= 80ms and has 68 edges
+        super().__init__(pin, ir_pdm.NEC, 68, 80, callback, *args)
+
+class AEHA(PDM_IR):
+    def __init__(self, pin, callback, *args):
+        # Aircon remotes send up to ~400ms of frames (see tools/samples/aircon)
+        super().__init__(pin, ir_pdm.AEHA, 700, 500, callback, *args)
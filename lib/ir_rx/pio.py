@@ -0,0 +1,116 @@
+# pio.py Edge capture for IR_RX by a PIO state machine and DMA (rp2 only).
+# Pass PIO_CAPTURE(pin) instead of the pin to any IR_RX subclass. The state
+# machine timestamps every edge in microseconds on the ticks_us() time base
+# and DMA writes the timestamps straight into the receiver's _times array,
+# so decode() runs unchanged but the widths carry no IRQ latency jitter.
+
+from machine import Timer
+from utime import ticks_us
+import rp2
+
+# x counts down once every 4 cycles (1us at 4MHz) from ~ticks_us() at start,
+# so ~x is the time of an edge. Every path through a loop takes 4 cycles.
+# The receiver output is active low: the pin is high between marks.
+@rp2.asm_pio()
+def _capture():
+    pull()
+    mov(x, invert(osr))
+    label("idle")  # The last block may have ended in a mark: wait for its end
+    jmp(pin, "first")
+    jmp(x_dec, "idle")[2]
+    jmp("idle")
+    label("first")  # Wait for the first mark and start the block timer
+    jmp(pin, "first_idle")
+    mov(isr, invert(x))
+    push(noblock)
+    irq(rel(0))
+    jmp(x_dec, "mark")
+    jmp("mark")  # x wrapped
+    label("first_idle")
+    jmp(x_dec, "first")[2]
+    jmp("first")
+    label("space")  # Pin high, wait for the start of a mark
+    jmp(pin, "space_idle")
+    mov(isr, invert(x))
+    push(noblock)
+    jmp(x_dec, "mark")
+    jmp("mark")
+    label("space_idle")
+    jmp(x_dec, "space")[2]
+    jmp("space")
+    label("mark")  # Pin low, wait for the end of the mark
+    jmp(pin, "rise")
+    jmp(x_dec, "mark")[2]
+    jmp("mark")
+    label("rise")
+    mov(isr, invert(x))
+    push(noblock)
+    jmp(x_dec, "space")
+    jmp("space")
+
+_FREQ = 4000000
+# RX FIFO of state machine 0 of each PIO block and its DMA request line
+_PIO_RXF = (0x50200020, 0x50300020)
+_DREQ_PIO_RX = (4, 12)
+
+class PIO_CAPTURE():
+    def __init__(self, pin, sm_id=0):
+        self._pin = pin
+        self._sm = rp2.StateMachine(sm_id, _capture, freq=_FREQ, jmp_pin=pin)
+        self._dma = rp2.DMA()
+        block, sm = sm_id >> 2, sm_id & 3
+        self._fifo = _PIO_RXF[block] + 4 * sm
+        self._ctrl = self._dma.pack_ctrl(size=2, inc_read=False, treq_sel=_DREQ_PIO_RX[block] + sm)
+        self._rx = None
+        self._cb = None  # The receiver's timer callback
+
+    # Called by IR_RX.__init__ in place of pin.irq()
+    def attach(self, rx):
+        if rx.compact:
+            raise ValueError('PIO capture writes 32 bit edge times, not the compact store')
+        self._rx = rx
+        self._sm.irq(self._on_first_edge)
+        self._start()
+
+    # IR_RX.close() detaches with irq(handler=None)
+    def irq(self, handler=None, trigger=0):
+        if handler is None:
+            self._sm.irq(None)
+            self._sm.active(0)
+            self._dma.close()
+            self._rx = None
+
+    # Capture into _times[0] on. The buffer is looked up again every time
+    # because IR_DUMP swaps it for a drained one.
+    def _start(self):
+        rx = self._rx
+        sm = self._sm
+        sm.active(0)
+        while sm.rx_fifo():
+            sm.get()  # Edges after the end of the last block
+        self._dma.active(0)
+        self._dma.config(read=self._fifo, write=rx._times, count=rx._nedges + 1, ctrl=self._ctrl, trigger=True)
+        sm.restart()
+        sm.active(1)
+        sm.put(ticks_us())
+
+    # Like IR_RX._cb_pin on the first edge. The receiver's callback is only
+    # final once its constructor has returned, so it is wrapped here.
+    def _on_first_edge(self, _):
+        rx = self._rx
+        if rx is None:
+            return
+        if self._cb is None:
+            self._cb = rx.cb
+            rx.cb = self._on_timer
+        rx.tim.init(period=rx._tblock, mode=Timer.ONE_SHOT, callback=rx.cb)
+
+    # Every timer callback first gets the number of edges DMA has written. A
+    # receiver that rearms its timer (IR_DUMP) keeps capturing, one that
+    # reset edge to 0 has ended the block.
+    def _on_timer(self, t):
+        rx = self._rx
+        rx.edge = rx._nedges + 1 - self._dma.count
+        self._cb(t)
+        if rx.edge == 0 and self._rx is rx:
+            self._start()
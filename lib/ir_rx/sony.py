@@ -4,7 +4,7 @@
 # Author: Peter Hinch
 # Copyright Peter Hinch 2020 Released under the MIT license
 
-from utime import ticks_us, ticks_diff
+from utime import ticks_us
 from ir_rx import IR_RX
 
 class SONY_ABC(IR_RX):  # Abstract base class
@@ -14,47 +14,53 @@ class SONY_ABC(IR_RX):  # Abstract base class
         # repeat period of 45ms.
         t = int(3 + bits * 1.8) + (1 if bits == 20 else 4)
         super().__init__(pin, 2 + bits * 2, t, callback, *args)
+        self._cmd = 0
         self._addr = 0
+        self._ext = 0
         self._bits = 20
 
     def decode(self, _):
-        try:
-            nedges = self.edge  # No. of edges detected
-            self.verbose and print('nedges', nedges)
-            if nedges > 42:
-                raise RuntimeError(self.OVERRUN)
-            bits = (nedges - 2) // 2
-            if nedges not in (26, 32, 42) or bits > self._bits:
-                raise RuntimeError(self.BADBLOCK)
-            self.verbose and print('SIRC {}bit'.format(bits))
-            width = ticks_diff(self._times[1], self._times[0])
-            if not 1800 < width < 3000:  # 2.4ms leading mark for all valid data
-                raise RuntimeError(self.BADSTART)
-            width = ticks_diff(self._times[2], self._times[1])
-            if not 350 < width < 1000:  # 600μs space
-                raise RuntimeError(self.BADSTART)
+        err = self._decode(self.edge)
+        if err:
+            self.do_callback(err, 0, 0)
+        else:
+            self.do_callback(self._cmd, self._addr, self._ext)
 
-            val = 0  # Data received, LSB 1st
-            x = 2
-            bit = 1
-            while x <= nedges - 2:
-                if ticks_diff(self._times[x + 1], self._times[x]) > 900:
-                    val |= bit
-                bit <<= 1
-                x += 2
-            cmd = val & 0x7f  # 7 bit command
-            val >>= 7
-            if nedges < 42:
-                addr = val & 0xff  # 5 or 8 bit addr
-                val = 0
-            else:
-                addr = val & 0x1f  # 5 bit addr
-                val >>= 5  # 8 bit extended
-        except RuntimeError as e:
-            cmd = e.args[0]
-            addr = 0
-            val = 0
-        self.do_callback(cmd, addr, val)
+    # Return 0 and the fields in _cmd, _addr, _ext or an error code. No
+    # exception or other heap object is created.
+    def _decode(self, nedges):  # No. of edges detected
+        self.verbose and print('nedges', nedges)
+        if nedges > 42:
+            return self.OVERRUN
+        bits = (nedges - 2) // 2
+        if nedges not in (26, 32, 42) or bits > self._bits:
+            return self.BADBLOCK
+        self.verbose and print('SIRC {}bit'.format(bits))
+        width_of = self.width
+        width = width_of(0)
+        if not 1800 < width < 3000:  # 2.4ms leading mark for all valid data
+            return self.BADSTART
+        width = width_of(1)
+        if not 350 < width < 1000:  # 600μs space
+            return self.BADSTART
+
+        val = 0  # Data received, LSB 1st
+        x = 2
+        bit = 1
+        while x <= nedges - 2:
+            if width_of(x) > 900:
+                val |= bit
+            bit <<= 1
+            x += 2
+        self._cmd = val & 0x7f  # 7 bit command
+        val >>= 7
+        if nedges < 42:
+            self._addr = val & 0xff  # 5 or 8 bit addr
+            self._ext = 0
+        else:
+            self._addr = val & 0x1f  # 5 bit addr
+            self._ext = val >> 5  # 8 bit extended
+        return 0
 
 class SONY_12(SONY_ABC):
     def __init__(self, pin, callback, *args):
@@ -16,6 +16,8 @@ from ir_rx.nec import NEC_8, NEC_16
 from ir_rx.sony import SONY_12, SONY_15, SONY_20
 from ir_rx.philips import RC5_IR, RC6_M0
 from ir_rx.mce import MCE
+from ir_rx.pdm import AEHA
+from ir_rx.multi import IR_MULTI
 
 # Define pin according to platform
 if platform == 'pyboard':
@@ -35,9 +37,22 @@ def cb(data, addr, ctrl):
     else:
         print('Data {:02x} Addr {:04x} Ctrl {:02x}'.format(data, addr, ctrl))
 
+# AEHA callback
+def cb_aeha(fields, data, nbits):
+    if nbits < 0:
+        print('Repeat code.')
+    else:
+        print('Customer {:04x} Parity {:x} Header {:x} Data {}'.format(fields[0], fields[1], fields[2],
+              ' '.join('{:02x}'.format(b) for b in data[:(nbits + 7) // 8])))
+
 def test(proto=0):
-    classes = (NEC_8, NEC_16, SONY_12, SONY_15, SONY_20, RC5_IR, RC6_M0, MCE)
-    ir = classes[proto](p, cb)  # Instantiate receiver
+    classes = (NEC_8, NEC_16, SONY_12, SONY_15, SONY_20, RC5_IR, RC6_M0, MCE, AEHA)
+    if proto < len(classes):
+        ir = classes[proto](p, cb_aeha if classes[proto] is AEHA else cb)  # Instantiate receiver
+    else:  # One receiver for all protocols
+        ir = IR_MULTI(p)
+        for cls in (NEC_16, SONY_20, RC5_IR, RC6_M0, MCE, AEHA):
+            ir.add(cls, cb_aeha if cls is AEHA else cb)
     ir.error_function(print_error)  # Show debug information
     #ir.verbose = True
     # A real application would do something here...
@@ -60,6 +75,8 @@ test(4) for Sony SIRC 20 bit,
 test(5) for Philips RC-5 protocol,
 test(6) for RC6 mode 0.
 test(7) for Microsoft Vista MCE.
+test(8) for AEHA (Japanese aircon) protocol.
+test(9) for all of NEC 16 bit, Sony, RC-5, RC-6, MCE and AEHA at once.
 
 Hit ctrl-c to stop, then ctrl-d to soft reset.'''
 
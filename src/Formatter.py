@@ -1,4 +1,38 @@
+import struct
+import utime
+
 class Formatter:
+    # Binary frame record: header followed by LEB128 varint deltas between
+    # consecutive edges (nedges - 1 of them). All fields are little-endian.
+    #   magic(2s) version(B) protocol(B) received(I) nedges(H) payload_len(H)
+    # protocol is an ir_detect protocol id.
+    RECORD_MAGIC = b"IR"
+    RECORD_VERSION = 1
+    RECORD_HEADER = "<2sBBIHH"
+    RECORD_HEADER_SIZE = 12
+    # Worst case is 4 bytes per delta (< 2^28us)
+    RECORD_MAX_DELTA_SIZE = 4
+    # Network batch: header followed by nrecords frame records.
+    #   magic(2s) version(B) nrecords(B) seq(H) payload_len(H)
+    # A signed batch ends with an HMAC-SHA256 of its header and payload.
+    BATCH_MAGIC = b"IB"
+    BATCH_VERSION = 1
+    BATCH_SIGNED_VERSION = 2
+    BATCH_HEADER = "<2sBBHH"
+    BATCH_HEADER_SIZE = 8
+    BATCH_MAC_SIZE = 32
+    # Flash journal block: header followed by nrecords frame records, zero
+    # padded to the block size. seq numbers the blocks of a journal.
+    #   magic(2s) version(B) nrecords(B) seq(I) payload_len(H)
+    JOURNAL_MAGIC = b"IJ"
+    JOURNAL_VERSION = 1
+    JOURNAL_HEADER = "<2sBBIH"
+    JOURNAL_HEADER_SIZE = 10
+    # Text dump: the "received time" line around the pairs, and digits of
+    # the longest offset or width
+    DUMP_HEADER_SIZE = 48
+    DUMP_MAX_DIGITS = 7
+
     def format_dumpdata(edge, offset, width):
         if edge > 0:
             pre = "," + (" " if edge % 10 != 0 else "\n")
@@ -6,6 +40,138 @@ class Formatter:
             pre = ""
         return "{}o:{:6}/w:{:4}".format(pre, offset, width)
 
+    # Text dump of a frame, byte for byte the lines IR_DUMP used to print with
+    # format_dumpdata() and format_localtime(), rendered into buf without a
+    # string per edge so it can be written at once. Pairs are printed for the
+    # edges below limit. Returns the length.
+    def format_dump(buf, times, nedges, limit, received, interval=None):
+        put = Formatter._put_int
+        [year, month, mday, hour, minute, second, _, _] = utime.localtime(received)
+        pos = Formatter._put_text(buf, 0, b"\nreceived time: ")
+        pos = put(buf, pos, year, 1)
+        buf[pos] = 0x2d  # -
+        pos = put(buf, pos + 1, month, 2, 0x30)
+        buf[pos] = 0x2d
+        pos = put(buf, pos + 1, mday, 2, 0x30)
+        buf[pos] = 0x20
+        pos = put(buf, pos + 1, hour, 2, 0x30)
+        buf[pos] = 0x3a  # :
+        pos = put(buf, pos + 1, minute, 2, 0x30)
+        buf[pos] = 0x3a
+        pos = put(buf, pos + 1, second, 2, 0x30)
+        buf[pos] = 0x5a  # Z
+        buf[pos + 1] = 0x0a
+        pos += 2
+        offset = 0
+        for edge in range(0, limit, 2):
+            # -1 if the signal has never fallen
+            if edge + 1 < nedges:
+                width = interval(times, edge) if interval is not None else utime.ticks_diff(times[edge + 1], times[edge])
+            else:
+                width = -1
+            if edge > 0:
+                buf[pos] = 0x2c  # ,
+                buf[pos + 1] = 0x20 if edge % 10 != 0 else 0x0a
+                pos += 2
+            buf[pos] = 0x6f  # o
+            buf[pos + 1] = 0x3a
+            pos = put(buf, pos + 2, offset, 6)
+            buf[pos] = 0x2f  # /
+            buf[pos + 1] = 0x77  # w
+            buf[pos + 2] = 0x3a
+            pos = put(buf, pos + 3, width, 4)
+            if edge + 2 < nedges:
+                offset += width + (interval(times, edge + 1) if interval is not None else utime.ticks_diff(times[edge + 2], times[edge + 1]))
+        buf[pos] = 0x0a
+        return pos + 1
+
+    # Largest format_dump() of nedges edges. Offsets and widths stay below
+    # DUMP_MAX_DIGITS digits as a capture lasts at most IR_DUMP._FRAME_MS.
+    def dump_size(nedges):
+        return Formatter.DUMP_HEADER_SIZE + (nedges // 2 + 1) * (7 + 2 * Formatter.DUMP_MAX_DIGITS)
+
+    def _put_text(buf, pos, text):
+        for c in text:
+            buf[pos] = c
+            pos += 1
+        return pos
+
+    # value in decimal, right aligned in width characters of fill like "{:4}"
+    def _put_int(buf, pos, value, width, fill=0x20):
+        v = -value if value < 0 else value
+        ndigits = 1
+        rest = v // 10
+        while rest:
+            ndigits += 1
+            rest //= 10
+        n = ndigits + 1 if value < 0 else ndigits
+        while n < width:
+            buf[pos] = fill
+            pos += 1
+            n += 1
+        if value < 0:
+            buf[pos] = 0x2d
+            pos += 1
+        end = pos + ndigits
+        while ndigits:
+            ndigits -= 1
+            buf[pos + ndigits] = 0x30 + v % 10
+            v //= 10
+        return end
+
     def format_localtime(time):
         [year, month, mday, hour, minute, second, _, _] = time
         return "{}-{:02}-{:02} {:02}:{:02}:{:02}Z".format(year, month, mday, hour, minute, second)
+
+    def record_size(nedges):
+        return Formatter.RECORD_HEADER_SIZE + nedges * Formatter.RECORD_MAX_DELTA_SIZE
+
+    # interval(times, x) is the time from edge x to edge x + 1, see IR_RX.
+    # Without it times holds ticks_us() values.
+    def format_record(buf, times, nedges, received, protocol, interval=None):
+        pos = Formatter.RECORD_HEADER_SIZE
+        before = times[0]
+        for edge in range(1, nedges):
+            if interval is None:
+                t = times[edge]
+                delta = utime.ticks_diff(t, before)
+                before = t
+            else:
+                delta = interval(times, edge - 1)
+            if delta < 0:
+                delta = 0
+            while delta > 0x7f:
+                buf[pos] = (delta & 0x7f) | 0x80
+                delta >>= 7
+                pos += 1
+            buf[pos] = delta
+            pos += 1
+        struct.pack_into(Formatter.RECORD_HEADER, buf, 0, Formatter.RECORD_MAGIC, Formatter.RECORD_VERSION,
+                         protocol, received, nedges, pos - Formatter.RECORD_HEADER_SIZE)
+        return pos
+
+    # Edge offsets (us from the first edge) of a frame record into times,
+    # which needs room for nedges. Returns (received, nedges).
+    def parse_record(record, times):
+        _, _, _, received, nedges, _ = struct.unpack_from(Formatter.RECORD_HEADER, record, 0)
+        pos = Formatter.RECORD_HEADER_SIZE
+        t = 0
+        times[0] = 0
+        for edge in range(1, nedges):
+            delta = 0
+            shift = 0
+            while True:
+                byte = record[pos]
+                pos += 1
+                delta |= (byte & 0x7f) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            t += delta
+            times[edge] = t
+        return received, nedges
+
+    def format_batch_header(buf, nrecords, seq, payload_len, signed=False):
+        version = Formatter.BATCH_SIGNED_VERSION if signed else Formatter.BATCH_VERSION
+        struct.pack_into(Formatter.BATCH_HEADER, buf, 0, Formatter.BATCH_MAGIC, version,
+                         nrecords, seq & 0xffff, payload_len)
@@ -1,30 +1,68 @@
-import time
 import utime
 import ujson
 import network
 import ntptime
+import uasyncio as asyncio
 from machine import Pin
 from dump import IR_DUMP
+from uploader import Uploader
+from journal import Journal
 from Formatter import Formatter
 
 class IrScanner:
     _IR_RECEIVER_PIN = 15
+    _UPLOAD_INTERVAL_MS = 20
+    _WIFI_POLL_MS = 500
+    _WIFI_TIMEOUT_MS = 10000
+    _WIFI_RETRY_MS = 30000
+    _NTP_RESYNC_MS = 3600000
+    _NTP_RETRY_MS = 60000
+    _HEARTBEAT_MS = 60000
+    _JOURNAL_INTERVAL_MS = 100
 
     def __init__(self):
         self._dump = None
+        self._uploader = None
+        self._journal = None
         self._config = None
+        self._wlan = None
+        # set by IR_DUMP.decode in the timer callback when a frame is queued
+        self._frame_ready = asyncio.ThreadSafeFlag()
 
     def run(self):
-        self._load_config()
-        self._activate_wifi()
-        self._load_time()
-        self._dump = IR_DUMP(Pin(IrScanner._IR_RECEIVER_PIN, Pin.IN), self.receive_ir_signal)
+        try:
+            asyncio.run(self._main())
+        except KeyboardInterrupt:
+            pass
 
-        while True:
-            try:
-                time.sleep_ms(1000)
-            except KeyboardInterrupt:
-                break
+    async def _main(self):
+        self._load_config()
+        # capture starts before the network, so nothing is missed while Wi-Fi associates
+        dump_config = self._config.get("dump", {})
+        pin = Pin(IrScanner._IR_RECEIVER_PIN, Pin.IN)
+        if dump_config.get("capture") == "pio":
+            # edges are timestamped by a PIO state machine instead of the pin IRQ
+            from ir_rx.pio import PIO_CAPTURE
+            pin = PIO_CAPTURE(pin)
+        # 16 bit gaps instead of 32 bit edge times: twice the edges per capture
+        IR_DUMP.compact = dump_config.get("compact", False)
+        self._dump = IR_DUMP(pin, self.receive_ir_signal)
+        self._dump.binary = dump_config.get("format") == "binary"
+        self._dump.set_idle_ms(dump_config.get("idle_ms", 50))
+        min_pulse_us = dump_config.get("min_pulse_us", 0)
+        min_leader_us = dump_config.get("min_leader_us", 0)
+        if min_pulse_us or min_leader_us:
+            # the PIO backend timestamps every edge itself, so this needs "capture": "irq"
+            self._dump.set_filter(min_pulse_us, min_leader_us)
+        self._dump.ready = self._frame_ready
+        journal_config = self._config.get("journal", {})
+        if journal_config.get("enabled"):
+            self._journal = Journal(journal_config.get("directory", "/journal"), journal_config.get("segments", 4), journal_config.get("segment_blocks", 16))
+            self._dump.journal = self._journal
+            asyncio.create_task(self._journal_task())
+        asyncio.create_task(self._output_task())
+        asyncio.create_task(self._heartbeat_task())
+        await self._wifi_task()
 
     def receive_ir_signal(self, data, addr, ctrl):
         pass
@@ -33,21 +71,90 @@ class IrScanner:
         with open("../resources/config.json", "r") as f:
             self._config = ujson.load(f)
 
-    def _activate_wifi(self):
-        wlan = network.WLAN(network.STA_IF)
-        wlan.active(True)
+    async def _output_task(self):
+        # formats and writes queued frames straight from the IR_DUMP ring slots
+        while True:
+            await self._frame_ready.wait()
+            self._dump.drain()
+
+    async def _upload_task(self):
+        while True:
+            self._uploader.poll()
+            await asyncio.sleep_ms(IrScanner._UPLOAD_INTERVAL_MS)
+
+    async def _journal_task(self):
+        # flash writes happen here, one block at a time, never in the capture path
+        while True:
+            self._journal.poll()
+            # with a journal the collector gets the records from flash, so a
+            # network outage only delays them. Without a collector they are
+            # replayed over serial with journal.replay_serial()
+            if self._uploader is not None and self._uploader.pending() == 0:
+                self._journal.replay(self._uploader.add)
+            await asyncio.sleep_ms(IrScanner._JOURNAL_INTERVAL_MS)
+
+    async def _wifi_task(self):
+        self._wlan = network.WLAN(network.STA_IF)
+        self._wlan.active(True)
+        while not await self._connect_wifi():
+            await asyncio.sleep_ms(IrScanner._WIFI_RETRY_MS)
+        asyncio.create_task(self._ntp_task())
+        self._start_uploader()
+        # reconnect if the access point goes away
+        while True:
+            await asyncio.sleep_ms(IrScanner._WIFI_RETRY_MS)
+            if not self._wlan.isconnected():
+                await self._connect_wifi()
+
+    async def _connect_wifi(self):
         print("connect")
-        wlan.connect(self._config["wlan"]["ssid"], self._config["wlan"]["password"])
-        max_wait = 10
-        while max_wait > 0:
-            if wlan.status() < 0 or wlan.status() >= 3:
+        self._wlan.connect(self._config["wlan"]["ssid"], self._config["wlan"]["password"])
+        start = utime.ticks_ms()
+        while utime.ticks_diff(utime.ticks_ms(), start) < IrScanner._WIFI_TIMEOUT_MS:
+            status = self._wlan.status()
+            if status < 0 or status >= 3:
                 break
-            max_wait -= 1
             print('waiting for connection...')
-            time.sleep(1)
-        
-        if wlan.status() != 3:
-            raise RuntimeError('network connection failed')
+            await asyncio.sleep_ms(IrScanner._WIFI_POLL_MS)
+        if self._wlan.status() != 3:
+            print("network connection failed")
+            return False
+        return True
+
+    async def _ntp_task(self):
+        while True:
+            try:
+                self._load_time()
+                await asyncio.sleep_ms(IrScanner._NTP_RESYNC_MS)
+            except OSError:
+                await asyncio.sleep_ms(IrScanner._NTP_RETRY_MS)
+
+    async def _heartbeat_task(self):
+        while True:
+            await asyncio.sleep_ms(IrScanner._HEARTBEAT_MS)
+            print("heartbeat: {} pending, {} dropped, {} upload dropped".format(
+                self._dump.pending(), self._dump.dropped, self._uploader.dropped if self._uploader is not None else 0))
+            if self._journal is not None:
+                print("journal: {} pending, {} unsent, {} dropped".format(self._journal.pending(), self._journal.unsent(), self._journal.dropped))
+            self._print_stats()
+
+    def _print_stats(self):
+        # receiver counters since boot, to spot overruns and slow decodes before frames are dropped
+        stats = self._dump.stats()
+        buckets = ["<{}us {}".format(limit, count) for limit, count in zip(IR_DUMP.DECODE_BUCKETS_US, stats["decode_us"])]
+        buckets.append(">={}us {}".format(IR_DUMP.DECODE_BUCKETS_US[-1], stats["decode_us"][-1]))
+        print("stats: {} edges, {} captures, {} frames, {} noise, {} overruns, errors {}, decode max {}us, {}".format(
+            stats["edges"], stats["captures"], stats["frames"], stats["noise"], stats["overruns"], stats["errors"], stats["decode_max_us"], ", ".join(buckets)))
+
+    def _start_uploader(self):
+        collector = self._config.get("collector", {})
+        if not collector.get("host"):
+            return
+        key = collector.get("key", "")
+        self._uploader = Uploader(collector["host"], collector.get("port", 5140), key.encode() if key else None)
+        if self._journal is None:
+            self._dump.uploader = self._uploader
+        asyncio.create_task(self._upload_task())
 
     def _load_time(self):
         ntptime.settime()
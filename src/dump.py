@@ -1,36 +1,123 @@
+import sys
 import utime
+import ir_detect
+from array import array
+from machine import Timer
 from ir_rx import IR_RX
 from Formatter import Formatter
 
 class IR_DUMP(IR_RX):
+    # A capture ends once no edge arrived for the idle time, or _FRAME_MS
+    # after its first edge at the latest. 50 ms keeps the frames of an AEHA
+    # transmission (35 ms apart) and a NEC frame with its first repeat code
+    # (42 ms) in one capture, like IrSignalAnalyzer expects.
+    _IDLE_MS = 50
     _FRAME_MS = 500
     _NUM_OF_EDGES = 700
+    # Number of capture buffers in the ring. One slot is always kept empty to
+    # tell a full ring from an empty one, so up to _FRAME_SLOTS - 1 frames can
+    # wait for drain() while the next frame is being captured.
+    _FRAME_SLOTS = 4
 
     def __init__(self, pin, callback, *args):
-        super().__init__(pin, IR_DUMP._NUM_OF_EDGES, IR_DUMP._FRAME_MS, callback, *args)
+        # the compact edge store holds twice the edges in the same RAM
+        nedges = IR_DUMP._NUM_OF_EDGES * 2 if self.compact else IR_DUMP._NUM_OF_EDGES
+        super().__init__(pin, nedges, IR_DUMP._IDLE_MS, callback, *args)
+        self.cb = self._check_idle
+        self.set_idle_ms(IR_DUMP._IDLE_MS)
+        # The timer callback (producer) only moves _head, drain() (consumer)
+        # only moves _tail, so no locking is needed between them.
+        self._slots = [self.new_buffer() for _ in range(IR_DUMP._FRAME_SLOTS)]
+        self._slot_edges = array('i', (0 for _ in range(IR_DUMP._FRAME_SLOTS)))
+        self._slot_times = array('i', (0 for _ in range(IR_DUMP._FRAME_SLOTS)))
+        self._head = 0
+        self._tail = 0
+        self.dropped = 0
+        # emit binary frame records instead of the o:/w: text dump
+        self.binary = False
+        # optional Uploader that also gets every frame record
+        self.uploader = None
+        # optional Journal that keeps every frame record on flash
+        self.journal = None
+        # optional ThreadSafeFlag set whenever a frame is queued for drain()
+        self.ready = None
+        self._record = bytearray(Formatter.record_size(nedges + 1))
+        # text dump buffer, allocated by the first _print_frame()
+        self._text = None
+
+    def set_idle_ms(self, idle_ms):
+        # 0 captures for the fixed _FRAME_MS window after the first edge
+        self._idle_us = idle_ms * 1000
+        self._tblock = idle_ms if idle_ms > 0 else IR_DUMP._FRAME_MS
+
+    # Timer callback. The timer is only armed on the first edge and rearmed
+    # here for the rest of the idle time, so _cb_pin stays as cheap as before.
+    def _check_idle(self, _):
+        nedges = self.edge
+        if self._idle_us > 0 and nedges <= self._nedges:
+            now = utime.ticks_us()
+            idle = utime.ticks_diff(now, self.last_ticks())
+            if idle < self._idle_us and utime.ticks_diff(now, self.first_ticks()) < IR_DUMP._FRAME_MS * 1000:
+                self.tim.init(period=(self._idle_us - idle) // 1000 + 1, mode=Timer.ONE_SHOT, callback=self.cb)
+                return
+        self._end_capture(None)
 
     def decode(self, _):
-        start_offset = self._times[0]
-        if self._times[2] == 0:
+        if self.edge < 3:
             # it is noise. not an ir signal.
             self._times[0] = 0
             self._times[1] = 0
         else:
-            print()
-            print("received time: {}".format(Formatter.format_localtime(utime.localtime())))
-            is_stream_over = False
-            for edge in range(0, IR_DUMP._NUM_OF_EDGES - 2, 2):
-                if not is_stream_over:
-                    t0 = self._times[edge]
-                    t1 = self._times[edge + 1]
-                    if edge > 0 and t0 == 0:
-                        is_stream_over = True
-                    else:
-                        offset = utime.ticks_diff(t0, start_offset)
-                        width = utime.ticks_diff(t1, t0) if t1 > 0 else -1 # assign -1 if the signal has never been fall down
-                        print(Formatter.format_dumpdata(edge, offset, width), end = "")
-                # clear
-                self._times[edge] = 0
-                self._times[edge - 1] = 0
-            print()
+            head = self._head
+            next_head = (head + 1) % IR_DUMP._FRAME_SLOTS
+            if next_head == self._tail:
+                # drain() has not caught up. keep the capture buffer and drop this frame.
+                self.dropped += 1
+                self._clear(self._times, self.edge)
+            else:
+                # hand over the filled buffer and continue capturing into the drained one.
+                self._slots[head], self._times = self._times, self._slots[head]
+                self._slot_edges[head] = self.edge
+                self._slot_times[head] = utime.time()
+                self._head = next_head
+                self._frame()
+                if self.ready is not None:
+                    self.ready.set()
         self.edge = 0
+
+    def pending(self):
+        return (self._head - self._tail) % IR_DUMP._FRAME_SLOTS
+
+    def drain(self):
+        while self._tail != self._head:
+            tail = self._tail
+            times = self._slots[tail]
+            nedges = self._slot_edges[tail]
+            if self.binary or self.uploader is not None or self.journal is not None:
+                self._write_record(times, nedges, self._slot_times[tail])
+            if not self.binary:
+                self._print_frame(times, nedges, self._slot_times[tail])
+            self._clear(times, nedges)
+            self._tail = (tail + 1) % IR_DUMP._FRAME_SLOTS
+
+    # the whole frame is rendered into one buffer and written at once
+    def _print_frame(self, times, nedges, received):
+        if self._text is None:
+            self._text = bytearray(Formatter.dump_size(self._nedges + 1))
+        size = Formatter.format_dump(self._text, times, nedges, min(nedges, self._nedges - 2), received, self.interval)
+        sys.stdout.buffer.write(memoryview(self._text)[:size])
+
+    def _write_record(self, times, nedges, received):
+        protocol = ir_detect.classify(times, nedges, None if self.compact else utime.ticks_diff)
+        size = Formatter.format_record(self._record, times, nedges, received, protocol, self.interval)
+        record = memoryview(self._record)[:size]
+        if self.uploader is not None:
+            self.uploader.add(record)
+        if self.journal is not None:
+            self.journal.add(record)
+        if self.binary:
+            sys.stdout.buffer.write(record)
+
+    def _clear(self, times, nedges):
+        for edge in range(min(nedges, self._nedges + 1)):
+            times[edge] = 0
@@ -0,0 +1,223 @@
+import os
+import struct
+import sys
+import utime
+from array import array
+from Formatter import Formatter
+
+class Journal:
+    # Frame records are kept on flash in a fixed set of segment files that are
+    # reused in turn, so the journal never grows beyond segments *
+    # segment_blocks blocks. Records are collected into block sized buffers
+    # (journal block header + records, zero padded) and flash is only written
+    # a whole block at a time. add() only copies into memory like
+    # Uploader.add(), poll() writes at most one block per call from the main
+    # loop, so flash stalls never reach the capture path. When the ring is
+    # full new records are dropped and counted.
+    #
+    # Every block has a sequence number that keeps increasing across reboots.
+    # Block seq lives at offset (seq % segment_blocks) of segment
+    # (seq // segment_blocks) % segments. replay() sends the records of the
+    # blocks written since the last replay, its cursor is kept in a file.
+    BLOCK_SIZE = 4096  # LittleFS block on the rp2 port
+    _BLOCK_SLOTS = 3
+    # A partly filled block is written after this
+    _FLUSH_MS = 30000
+    # The cursor file is updated after this many replayed blocks (and by
+    # close()), so it costs a flash write per this many blocks. After a reboot
+    # at most this many blocks are sent again.
+    _CURSOR_BLOCKS = 16
+
+    def __init__(self, directory="/journal", segments=4, segment_blocks=16):
+        self._directory = directory
+        self._segments = segments
+        self._segment_blocks = segment_blocks
+        try:
+            os.mkdir(directory)
+        except OSError:
+            pass  # already there
+        self._blocks = [bytearray(Journal.BLOCK_SIZE) for _ in range(Journal._BLOCK_SLOTS)]
+        self._sizes = array('i', (0 for _ in range(Journal._BLOCK_SLOTS)))
+        self._counts = bytearray(Journal._BLOCK_SLOTS)
+        self._head = 0
+        self._tail = 0
+        self._opened = 0
+        self._file = None
+        self._seq = self._recover()
+        self._cursor = self._load_cursor()
+        self._replayed = 0
+        self._read_buf = bytearray(Journal.BLOCK_SIZE)
+        # pads a block, so no bytes of older records in its slot reach flash
+        self._zeros = memoryview(bytes(Journal.BLOCK_SIZE))
+        self.dropped = 0
+
+    def add(self, record):
+        size = len(record)
+        if size > Journal.BLOCK_SIZE - Formatter.JOURNAL_HEADER_SIZE:
+            self.dropped += 1
+            return
+        used = self._sizes[self._head]
+        if used + size > Journal.BLOCK_SIZE or self._counts[self._head] == 255:
+            if not self._seal():
+                self.dropped += 1
+                return
+            used = 0
+        head = self._head
+        if used == 0:
+            used = Formatter.JOURNAL_HEADER_SIZE
+            self._opened = utime.ticks_ms()
+        self._blocks[head][used:used + size] = record
+        self._sizes[head] = used + size
+        self._counts[head] += 1
+
+    # Called from the main loop. Writes the oldest sealed block, if any.
+    def poll(self):
+        if self._sizes[self._head] > 0 and utime.ticks_diff(utime.ticks_ms(), self._opened) >= Journal._FLUSH_MS:
+            self._seal()
+        if self._tail == self._head:
+            return
+        tail = self._tail
+        block = self._blocks[tail]
+        size = self._sizes[tail]
+        seq = self._seq
+        if seq % self._segment_blocks == 0 or self._file is None:
+            self._open_segment(seq)
+        struct.pack_into(Formatter.JOURNAL_HEADER, block, 0, Formatter.JOURNAL_MAGIC, Formatter.JOURNAL_VERSION,
+                         self._counts[tail], seq, size - Formatter.JOURNAL_HEADER_SIZE)
+        block[size:] = self._zeros[size:]
+        self._file.write(block)
+        self._file.flush()
+        self._seq = seq + 1
+        self._sizes[tail] = 0
+        self._counts[tail] = 0
+        self._tail = (tail + 1) % Journal._BLOCK_SLOTS
+
+    def pending(self):
+        return (self._head - self._tail) % Journal._BLOCK_SLOTS
+
+    # Send the records of up to max_blocks blocks written since the last
+    # replay, each as sink(record) (e.g. sys.stdout.buffer.write, which
+    # analyzer.py --binary reads, or Uploader.add). Blocks that were reused
+    # before they were replayed are skipped. Returns the number of blocks sent.
+    def replay(self, sink, max_blocks=1):
+        # the newest segment is the one holding the last written block. Until
+        # the next block opens a new one, all segments are still readable.
+        oldest = ((self._seq - 1) // self._segment_blocks - self._segments + 1) * self._segment_blocks
+        if self._cursor < oldest:
+            self._cursor = oldest
+        sent = 0
+        while sent < max_blocks and self._cursor < self._seq:
+            size = self._read_block(self._cursor)
+            if size:
+                block = memoryview(self._read_buf)
+                pos = Formatter.JOURNAL_HEADER_SIZE
+                while pos < size:
+                    length = Formatter.RECORD_HEADER_SIZE + struct.unpack_from(Formatter.RECORD_HEADER, block, pos)[5]
+                    sink(block[pos:pos + length])
+                    pos += length
+                sent += 1
+            self._cursor += 1
+            self._replayed += 1
+        if self._replayed >= Journal._CURSOR_BLOCKS:
+            self._save_cursor()
+        return sent
+
+    # Number of written blocks replay() has not sent yet
+    def unsent(self):
+        return self._seq - self._cursor
+
+    def close(self):
+        if self._replayed:
+            self._save_cursor()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _seal(self):
+        next_head = (self._head + 1) % Journal._BLOCK_SLOTS
+        if next_head == self._tail:
+            return False
+        self._head = next_head
+        return True
+
+    def _segment_path(self, seq):
+        return "{}/seg{}.bin".format(self._directory, (seq // self._segment_blocks) % self._segments)
+
+    def _open_segment(self, seq):
+        if self._file is not None:
+            self._file.close()
+        # a new segment replaces the oldest one
+        self._file = open(self._segment_path(seq), "wb" if seq % self._segment_blocks == 0 else "ab")
+
+    # First sequence number to write after a reboot: continues the segment
+    # with the newest blocks. A segment that is full, or ends in a block cut
+    # short by a power loss, is left for the next one.
+    def _recover(self):
+        newest = -1
+        size = 0
+        header = bytearray(Formatter.JOURNAL_HEADER_SIZE)
+        for segment in range(self._segments):
+            path = "{}/seg{}.bin".format(self._directory, segment)
+            try:
+                with open(path, "rb") as f:
+                    if f.readinto(header) != len(header):
+                        continue
+                length = os.stat(path)[6]
+            except OSError:
+                continue
+            magic, _, _, seq, _ = struct.unpack(Formatter.JOURNAL_HEADER, header)
+            if magic == Formatter.JOURNAL_MAGIC and seq > newest:
+                newest = seq
+                size = length
+        if newest < 0:
+            return 0
+        seq = newest + size // Journal.BLOCK_SIZE
+        if size % Journal.BLOCK_SIZE or seq % self._segment_blocks == 0:
+            return (newest // self._segment_blocks + 1) * self._segment_blocks
+        return seq
+
+    # Size of block seq into _read_buf, 0 if it is not on flash (anymore)
+    def _read_block(self, seq):
+        try:
+            with open(self._segment_path(seq), "rb") as f:
+                f.seek((seq % self._segment_blocks) * Journal.BLOCK_SIZE)
+                if f.readinto(self._read_buf) != Journal.BLOCK_SIZE:
+                    return 0
+        except OSError:
+            return 0
+        magic, _, _, block_seq, length = struct.unpack_from(Formatter.JOURNAL_HEADER, self._read_buf, 0)
+        if magic != Formatter.JOURNAL_MAGIC or block_seq != seq:
+            return 0
+        return Formatter.JOURNAL_HEADER_SIZE + length
+
+    def _load_cursor(self):
+        try:
+            with open(self._directory + "/cursor", "r") as f:
+                cursor = int(f.read())
+        except (OSError, ValueError):
+            return 0
+        # a cursor from a journal that was since wiped starts over
+        return cursor if cursor <= self._seq else 0
+
+    def _save_cursor(self):
+        with open(self._directory + "/cursor", "w") as f:
+            f.write(str(self._cursor))
+        self._replayed = 0
+
+# Replay over serial, e.g. after the scanner ran with no host attached: stop
+# it with Ctrl-C (it owns the journal while it runs), then
+#   mpremote exec "import journal; journal.replay_serial()" > DATA.txt
+# prints the records not replayed yet as the text dump analyzer.py reads.
+def replay_serial(directory="/journal", segments=4, segment_blocks=16):
+    journal = Journal(directory, segments, segment_blocks)
+    while journal.unsent():
+        journal.replay(_print_record, Journal._CURSOR_BLOCKS)
+    journal.close()
+
+def _print_record(record):
+    nedges = struct.unpack_from(Formatter.RECORD_HEADER, record, 0)[4]
+    times = array('i', (0 for _ in range(max(nedges, 1))))
+    received, nedges = Formatter.parse_record(record, times)
+    text = bytearray(Formatter.dump_size(nedges))
+    size = Formatter.format_dump(text, times, nedges, nedges, received)
+    sys.stdout.buffer.write(memoryview(text)[:size])
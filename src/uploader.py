@@ -0,0 +1,155 @@
+import errno
+import hashlib
+import hmac
+import socket
+import utime
+from array import array
+from Formatter import Formatter
+
+class BatchSigner:
+    # HMAC-SHA256 whose keyed pad state is computed once. HMAC.copy() reuses
+    # it where the hash can be copied. MicroPython hashes cannot, so there the
+    # padded key blocks are kept and each batch costs only the two hash runs.
+    _BLOCK_SIZE = 64
+
+    def __init__(self, key):
+        self._hmac = hmac.HMAC(key, digestmod=hashlib.sha256)
+        try:
+            self._hmac.copy()
+            self._ipad = None
+        except NotImplementedError:
+            if len(key) > BatchSigner._BLOCK_SIZE:
+                key = hashlib.sha256(key).digest()
+            key = key + bytes(BatchSigner._BLOCK_SIZE - len(key))
+            self._ipad = bytes(x ^ 0x36 for x in key)
+            self._opad = bytes(x ^ 0x5C for x in key)
+
+    def sign(self, data):
+        if self._ipad is None:
+            h = self._hmac.copy()
+            h.update(data)
+            return h.digest()
+        inner = hashlib.sha256(self._ipad)
+        inner.update(data)
+        outer = hashlib.sha256(self._opad)
+        outer.update(inner.digest())
+        return outer.digest()
+
+class Uploader:
+    # Frame records are collected into batches and sent over a persistent TCP
+    # connection to tools/src/collector.py. The send queue is a fixed ring of
+    # batch buffers: add() only copies into memory and never touches the
+    # socket, so capture is never blocked by the network. When the ring is
+    # full new records are dropped and counted. With a key every batch is
+    # signed when it is sealed, which is on the main loop like sending.
+    _BATCH_SIZE = 4096
+    # One slot is always the batch being filled
+    _BATCH_SLOTS = 4
+    # A partly filled batch is sent after this
+    _BATCH_MS = 1000
+    _RECONNECT_MS = 5000
+
+    def __init__(self, host, port, key=None):
+        self._address = socket.getaddrinfo(host, port)[0][-1]
+        self._signer = BatchSigner(key) if key else None
+        # room for records and the MAC
+        self._capacity = Uploader._BATCH_SIZE - (Formatter.BATCH_MAC_SIZE if key else 0)
+        self._batches = [bytearray(Uploader._BATCH_SIZE) for _ in range(Uploader._BATCH_SLOTS)]
+        # bytes used in each batch, 0 for an empty batch
+        self._sizes = array('i', (0 for _ in range(Uploader._BATCH_SLOTS)))
+        self._counts = bytearray(Uploader._BATCH_SLOTS)
+        self._head = 0
+        self._tail = 0
+        self._sent = 0
+        self._seq = 0
+        self._opened = 0
+        self._socket = None
+        self._connect_at = utime.ticks_ms()
+        self.dropped = 0
+
+    def add(self, record):
+        size = len(record)
+        if size > self._capacity - Formatter.BATCH_HEADER_SIZE:
+            self.dropped += 1
+            return
+        used = self._sizes[self._head]
+        if used + size > self._capacity or self._counts[self._head] == 255:
+            if not self._seal():
+                self.dropped += 1
+                return
+            used = 0
+        head = self._head
+        if used == 0:
+            used = Formatter.BATCH_HEADER_SIZE
+            self._opened = utime.ticks_ms()
+        self._batches[head][used:used + size] = record
+        self._sizes[head] = used + size
+        self._counts[head] += 1
+
+    # Called from the main loop. Sends as much of the queue as the socket
+    # takes without blocking.
+    def poll(self):
+        if self._sizes[self._head] > 0 and utime.ticks_diff(utime.ticks_ms(), self._opened) >= Uploader._BATCH_MS:
+            self._seal()
+        while self._tail != self._head:
+            if self._socket is None and not self._connect():
+                return
+            tail = self._tail
+            size = self._sizes[tail]
+            try:
+                sent = self._socket.send(memoryview(self._batches[tail])[self._sent:size])
+            except OSError as e:
+                if e.args[0] not in (errno.EAGAIN, errno.EINPROGRESS):
+                    self._close()
+                return
+            if not sent:
+                return
+            self._sent += sent
+            if self._sent < size:
+                return
+            self._sent = 0
+            self._sizes[tail] = 0
+            self._counts[tail] = 0
+            self._tail = (tail + 1) % Uploader._BATCH_SLOTS
+
+    def pending(self):
+        return (self._head - self._tail) % Uploader._BATCH_SLOTS
+
+    def _seal(self):
+        head = self._head
+        next_head = (head + 1) % Uploader._BATCH_SLOTS
+        if next_head == self._tail:
+            return False
+        batch = self._batches[head]
+        size = self._sizes[head]
+        Formatter.format_batch_header(batch, self._counts[head], self._seq,
+                                      size - Formatter.BATCH_HEADER_SIZE, self._signer is not None)
+        if self._signer is not None:
+            batch[size:size + Formatter.BATCH_MAC_SIZE] = self._signer.sign(memoryview(batch)[:size])
+            self._sizes[head] = size + Formatter.BATCH_MAC_SIZE
+        self._seq += 1
+        self._head = next_head
+        return True
+
+    def _connect(self):
+        if utime.ticks_diff(utime.ticks_ms(), self._connect_at) < 0:
+            return False
+        s = socket.socket()
+        s.setblocking(False)
+        try:
+            s.connect(self._address)
+        except OSError as e:
+            if e.args[0] != errno.EINPROGRESS:
+                s.close()
+                self._connect_at = utime.ticks_add(utime.ticks_ms(), Uploader._RECONNECT_MS)
+                return False
+        self._socket = s
+        return True
+
+    def _close(self):
+        # a batch cut off by a lost connection is sent again from its start,
+        # the collector drops the incomplete copy
+        self._socket.close()
+        self._socket = None
+        self._sent = 0
+        self._connect_at = utime.ticks_add(utime.ticks_ms(), Uploader._RECONNECT_MS)
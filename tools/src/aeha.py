@@ -1,4 +1,4 @@
-from common import IrFrameIntermediatePartElement, IrFramePartElement, IrSignalAnalyzerConfig, LeaderPartElement, IrFrame
+from common import IrFrameIntermediatePartElement, IrFramePartElement, IrSignalAnalyzerConfig, LeaderPartElement, IrFrame, format_bits
 
 class AehaLeaderPartElement(LeaderPartElement):
     def __init__(self) -> None:
@@ -52,6 +52,15 @@ class AehaIrFrame(IrFrame):
             data_part += "{:08b} ".format(byte)
         print("{:016b}/{:04b}/{:04b}/{}".format(self._customer, self._parity, self._data_header, data_part))
 
+    def get_fields(self) -> list[tuple[str, str]]:
+        fields = [("customer", format_bits(self._customer, 16)), ("parity", format_bits(self._parity, 4)), ("data_header", format_bits(self._data_header, 4))]
+        for index, byte in enumerate(self._data):
+            fields.append(("data[{}]".format(index), format_bits(byte, 8)))
+        return fields
+
+    def get_key(self) -> tuple:
+        return (self._customer, self._data_header)
+
 class AehaAnalyzerConfig(IrSignalAnalyzerConfig):
     def __init__(self) -> None:
         super().__init__(425, [AehaLeaderPartElement(), AehaCustomerPartElement(), AehaParityPartElement(), AehaDataHeaderPartElement(), AehaDataPartElement()], lambda e: AehaIrFrame(e))
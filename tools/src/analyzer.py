@@ -1,17 +1,26 @@
 import sys
-from common import IrPulse, IrFrameIntermediatePartElement, IrSignalAnalyzerConfig, LeaderPartElement
+from collections import Counter
+from typing import Iterable, Iterator
+from common import IrFrame, IrPulse, IrFrameIntermediatePartElement, IrSignalAnalyzerConfig, IrTimeWindow, LeaderPartElement, TimingStatistics, iter_dump_pulses, parse_dump_line, read_pulses
 from aeha import AehaAnalyzerConfig, AehaDataPartElement
 from nec import NecAnalyzerConfig
 
 class IrSignalAnalyzer:
-    _ALLOWED_ERROR_RATE = 0.1
-    _WARNING_ERROR_RATE = 0.2
     _FRAME_END_GAP_US = 8000
 
-    def __init__(self, config: IrSignalAnalyzerConfig) -> None:
+    # warnings is a shared counter of warning kinds (see _count_warning). The
+    # analyzer never prints them, callers report the totals. If timings is
+    # given, every matched time is also added to it per symbol class.
+    def __init__(self, config: IrSignalAnalyzerConfig, warnings: Counter | None = None, timings: TimingStatistics | None = None) -> None:
         self._t_us = config.t_us
-        self._bit0_gap_us = self._t_us
-        self._bit1_gap_us = self._t_us * 3
+        self._leader_high = config.leader_high
+        self._frame_low = config.frame_low
+        self._repeat_low = config.repeat_low
+        self._bit_gap_table = config.bit_gap_table
+        self._bit0_gap_us = config.bit0_gap.nominal_us
+        self._bit1_gap_us = config.bit1_gap.nominal_us
+        self.warnings = warnings if warnings is not None else Counter()
+        self.timings = timings
         self._frame_builder = config.frame_builder
         self._frames = []
         self._current_pulse = None
@@ -25,34 +34,34 @@ class IrSignalAnalyzer:
             element.set_leader_found()
             self._is_leader_passed = False
         if not element.is_leader_found():
-            if self._is_leader_pulse(element, self._current_pulse):
+            if self._is_leader_pulse(self._current_pulse):
                 element.set_leader_found()
         else:
             gap_us = self._get_gap_us()
-            frame_low_us = element.get_frame_low_t() * self._t_us
-            repeat_low_us = element.get_repeat_low_t() * self._t_us
-            if self._is_time_approx_equal(gap_us, frame_low_us):
+            if self._is_in_window(gap_us, self._frame_low, "frame_low"):
                 self._advance_cursor()
-            elif self._is_time_approx_equal(gap_us, repeat_low_us):
+            elif self._is_in_window(gap_us, self._repeat_low, "repeat_low"):
                 # repeat code
                 element.reset()
             else:
                 # error
-                print("warn: unexpected gap time {}us".format(gap_us))
+                self._count_warning("unexpected_gap")
                 self._advance_cursor()
 
     def visitIntermediate(self, element: IrFrameIntermediatePartElement) -> None:
+        self._add_mark_timing()
         element.store_bit(self._is_on_bit_pulse(self._get_gap_us()))
         if element.has_part_ended():
             self._advance_cursor()
-            self._is_leader_passed = self._is_leader_pulse(self._elements[0], self._current_pulse)
+            self._is_leader_passed = self._is_leader_pulse(self._current_pulse)
 
     def visitData(self, element: AehaDataPartElement) -> None:
         gap_us = self._get_gap_us()
         if self._is_passed_trailer(gap_us):
             self._advance_cursor()
-            self._is_leader_passed = self._is_leader_pulse(self._elements[0], self._current_pulse)
+            self._is_leader_passed = self._is_leader_pulse(self._current_pulse)
         else:
+            self._add_mark_timing()
             element.store_bit(self._is_on_bit_pulse(gap_us))
 
     def finalize(self) -> None:
@@ -62,71 +71,129 @@ class IrSignalAnalyzer:
                 break
         for element in self._elements:
             element.reset()
+        self._element_cursor = 0
+        self._is_leader_passed = False
 
     def _get_gap_us(self) -> int:
         return self._current_pulse.raise_us - self._before_pulse.fall_us
 
-    def _is_time_approx_equal(self, target_us: int, measured_us: int) -> bool:
-        diff_rate = abs(measured_us - target_us) / measured_us
-        if diff_rate > IrSignalAnalyzer._WARNING_ERROR_RATE:
+    def _is_in_window(self, measured_us: int, window: IrTimeWindow, symbol: str) -> bool:
+        matched = window.classify(measured_us)
+        if matched == IrTimeWindow.OUT:
             return False
-        elif diff_rate > IrSignalAnalyzer._ALLOWED_ERROR_RATE:
-            print("warn: the measured time is too far from the target time. target: {}us measured: {}us".format(target_us, measured_us))
+        if matched == IrTimeWindow.WARNING:
+            self._count_warning(symbol)
+        if self.timings is not None:
+            self.timings.add(symbol, window.nominal_us, measured_us)
         return True
 
-    def _is_leader_pulse(self, element: LeaderPartElement, pulse: IrPulse) -> bool:
-        leader_high_us = self._t_us * element.get_high_t()
-        return self._is_time_approx_equal(pulse.duration_us, leader_high_us)
+    def _is_leader_pulse(self, pulse: IrPulse) -> bool:
+        return self._is_in_window(pulse.duration_us, self._leader_high, "leader")
 
     def _is_passed_trailer(self, gap_us: int) -> bool:
-        return gap_us >= IrSignalAnalyzer._FRAME_END_GAP_US
+        # a negative gap is the start of the next dump, which ends the frame too
+        return gap_us >= IrSignalAnalyzer._FRAME_END_GAP_US or gap_us < 0
 
     def _is_on_bit_pulse(self, gap_us: int) -> bool:
-        if self._is_time_approx_equal(gap_us, self._bit0_gap_us):
+        bit = self._bit_gap_table[gap_us] if 0 <= gap_us < len(self._bit_gap_table) else IrSignalAnalyzerConfig.BIT_UNEXPECTED
+        if self.timings is not None and bit != IrSignalAnalyzerConfig.BIT_UNEXPECTED:
+            if bit <= IrSignalAnalyzerConfig.BIT0_WARNING:
+                self.timings.add("bit0", self._bit0_gap_us, gap_us)
+            else:
+                self.timings.add("bit1", self._bit1_gap_us, gap_us)
+        if bit == IrSignalAnalyzerConfig.BIT0:
             return False
-        elif not self._is_time_approx_equal(gap_us, self._bit1_gap_us):
-            print("warn: unexpected gap time {}us".format(gap_us))
+        if bit == IrSignalAnalyzerConfig.BIT0_WARNING:
+            self._count_warning("bit0")
+            return False
+        if bit == IrSignalAnalyzerConfig.BIT1_WARNING:
+            self._count_warning("bit1")
+        elif bit == IrSignalAnalyzerConfig.BIT_UNEXPECTED:
+            self._count_warning("unexpected_gap")
         return True
 
+    def _add_mark_timing(self) -> None:
+        # data marks are all one T long
+        if self.timings is not None and self._current_pulse.duration_us >= 0:
+            self.timings.add("mark", self._t_us, self._current_pulse.duration_us)
+
+    def _count_warning(self, kind: str) -> None:
+        # kind is the symbol whose time was too far from its nominal value
+        # (leader, frame_low, repeat_low, bit0, bit1) or unexpected_gap
+        self.warnings[kind] += 1
+
     def _advance_cursor(self) -> None:
         self._element_cursor = (self._element_cursor + 1) % len(self._elements)
         if self._element_cursor == 0:
             self.finalize()
 
     def analyze(self, line: str) -> None:
-        for pulse in self._parse_line(line):
-            self._current_pulse = pulse
-            self._elements[self._element_cursor].accept(self)
-            self._before_pulse = pulse
+        self.analyze_pulses(self._parse_line(line))
+
+    def analyze_pulses(self, pulses: Iterable[IrPulse]) -> None:
+        for pulse in pulses:
+            self._accept_pulse(pulse)
+
+    def stream(self, pulses: Iterable[IrPulse]) -> Iterator[IrFrame]:
+        # yields each frame as soon as it is finalized instead of keeping it
+        # for dump(), so memory stays constant on endless inputs
+        yield from self.feed(pulses)
+        yield from self.flush()
+
+    def feed(self, pulses: Iterable[IrPulse]) -> Iterator[IrFrame]:
+        for pulse in pulses:
+            self._accept_pulse(pulse)
+            while self._frames:
+                yield self._frames.pop(0)
+
+    def flush(self) -> Iterator[IrFrame]:
+        self.finalize()
+        while self._frames:
+            yield self._frames.pop(0)
+
+    def _accept_pulse(self, pulse: IrPulse) -> None:
+        self._current_pulse = pulse
+        self._elements[self._element_cursor].accept(self)
+        self._before_pulse = pulse
 
     def dump(self) -> None:
         for frame in self._frames:
             frame.dump()
 
     def _parse_line(self, line: str) -> list[IrPulse]:
-        start_pos = line.find("] ") + 1
-        parsed = []
-        for data_pair in line[start_pos:].split(","):
-            if data_pair.find("/") == -1:
-                continue
-            [offset_pair, width_pair] = data_pair.split("/", 2)
-            offset_value = int(offset_pair.split(":", 2)[1])
-            width_value = int(width_pair.split(":", 2)[1])
-            parsed.append(IrPulse(offset_value, width_value))
-        return parsed
+        return list(parse_dump_line(line))
+
+def print_warnings(warnings: Counter) -> None:
+    for kind, count in sorted(warnings.items()):
+        print("warn: {} {} time(s)".format("unexpected gap time" if kind == "unexpected_gap" else "too far from the nominal {} time".format(kind), count))
 
 def print_usage() -> str:
-    print("usage: cat samples/aircon/DATA.txt | python {} aeha".format(args[0]))
-    print("       cat samples/fan/DATA.txt | python {} nec".format(args[0]))
+    print("usage: cat samples/aircon/DATA.txt | python {} aeha [--vectorized]".format(args[0]))
+    print("       tail -f serial.log | python {} aeha".format(args[0]))
+    print("       cat samples/fan/DATA.txt | python {} nec [--vectorized]".format(args[0]))
+    print("       cat DATA.bin | python {} aeha|nec --binary [--vectorized]".format(args[0]))
+    print("       cat samples/*/DATA.txt | python {} auto [--binary]".format(args[0]))
+    print("       cat samples/aircon/DATA.txt | python {} aeha|nec --compiled [--binary]".format(args[0]))
 
 if __name__ == "__main__":
     try:
         args = sys.argv
-        line = input()
-        if len(args) != 2 or len(line) == 0:
+        options = args[2:]
+        if len(args) < 2 or not set(options) <= {"--binary", "--vectorized", "--compiled"}:
             print_usage()
             exit(1)
+        is_binary = "--binary" in options
         format = args[1].lower()
+        pulses = read_pulses(sys.stdin.buffer) if is_binary else iter_dump_pulses(sys.stdin)
+        if format == "auto":
+            # detect the protocol per burst, which also handles mixed captures
+            from detect import stream_mixed
+            warnings = Counter()
+            for _, frame in stream_mixed(pulses, warnings):
+                frame.dump()
+                sys.stdout.flush()
+            print_warnings(warnings)
+            exit(0)
         if format == "aeha":
             config = AehaAnalyzerConfig()
         elif format == "nec":
@@ -134,14 +201,26 @@ if __name__ == "__main__":
         else:
             print_usage()
             exit(2)
-        analyzer = IrSignalAnalyzer(config)
-        while True:
-            try:
-                analyzer.analyze(line)
-                line = input()
-            except EOFError:
-                break
-        analyzer.finalize()
-        analyzer.dump()
+        if "--vectorized" in options:
+            from vectorized import VectorizedIrSignalAnalyzer
+            analyzer = VectorizedIrSignalAnalyzer(config)
+            if is_binary:
+                analyzer.load_records(sys.stdin.buffer)
+            else:
+                analyzer.load_text(sys.stdin.read())
+            analyzer.analyze()
+            analyzer.dump()
+            exit(0)
+        if "--compiled" in options:
+            from compiled import CompiledIrSignalAnalyzer
+            analyzer = CompiledIrSignalAnalyzer(config)
+        else:
+            analyzer = IrSignalAnalyzer(config)
+        # frames are printed as they complete, so this also works on a live log (tail -f)
+        for frame in analyzer.stream(pulses):
+            frame.dump()
+            sys.stdout.flush()
+        if isinstance(analyzer, IrSignalAnalyzer):
+            print_warnings(analyzer.warnings)
     except KeyboardInterrupt:
         pass
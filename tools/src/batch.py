@@ -0,0 +1,87 @@
+import contextlib
+import io
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from common import IrPulse, parse_dump_line, read_pulses
+from detect import get_protocol_name, stream_mixed
+
+class CaptureReport:
+    # protocol lists every protocol found in the capture, e.g. "aeha+nec"
+    def __init__(self, path: str, protocol: str | None, frames: list[str], warnings: int) -> None:
+        self.path = path
+        self.protocol = protocol
+        self.frames = frames
+        self.warnings = warnings
+
+def list_captures(paths: list[str]) -> list[str]:
+    captures = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                captures.extend(os.path.join(root, name) for name in sorted(files) if name.endswith((".txt", ".bin")))
+        else:
+            captures.append(path)
+    return captures
+
+def load_pulses(path: str) -> list[IrPulse]:
+    if path.endswith(".bin"):
+        with open(path, "rb") as f:
+            return list(read_pulses(f))
+    pulses = []
+    with open(path, "r") as f:
+        for line in f:
+            pulses.extend(parse_dump_line(line))
+    return pulses
+
+def analyze_capture(path: str) -> CaptureReport:
+    pulses = load_pulses(path)
+    protocols = []
+    frames = []
+    warnings = Counter()
+    for protocol, frame in stream_mixed(pulses, warnings):
+        name = get_protocol_name(protocol)
+        if name not in protocols:
+            protocols.append(name)
+        dumped = io.StringIO()
+        with contextlib.redirect_stdout(dumped):
+            frame.dump()
+        frames.extend(dumped.getvalue().splitlines())
+    if len(protocols) == 0:
+        return CaptureReport(path, None, [], 0)
+    return CaptureReport(path, "+".join(protocols), frames, sum(warnings.values()))
+
+def analyze_captures(paths: list[str], jobs: int | None = None) -> list[CaptureReport]:
+    captures = list_captures(paths)
+    if len(captures) == 0:
+        return []
+    workers = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() keeps the input order, so the report does not depend on scheduling
+        return list(executor.map(analyze_capture, captures, chunksize=max(1, len(captures) // (workers * 4))))
+
+def print_usage() -> None:
+    print("usage: python {} [-j JOBS] PATH...".format(args[0]))
+    print("       PATH is a capture (.txt dump or .bin records) or a directory of captures")
+
+if __name__ == "__main__":
+    try:
+        args = sys.argv
+        paths = args[1:]
+        jobs = None
+        if len(paths) >= 2 and paths[0] == "-j":
+            jobs = int(paths[1])
+            paths = paths[2:]
+        if len(paths) == 0:
+            print_usage()
+            exit(1)
+        for report in analyze_captures(paths, jobs):
+            if report.protocol is None:
+                print("== {} (unknown protocol)".format(report.path))
+                continue
+            print("== {} ({}, {} frames, {} warnings)".format(report.path, report.protocol, len(report.frames), report.warnings))
+            for frame in report.frames:
+                print(frame)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,190 @@
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+import numpy as np
+from common import iter_dump_pulses
+from aeha import AehaAnalyzerConfig
+from nec import NecAnalyzerConfig
+from analyzer import IrSignalAnalyzer
+from batch import list_captures
+from simulator import DECODERS, replay_captures
+import generator
+
+# Every benchmark reports the same fields. A call is the decoder's unit of
+# work: a timer callback for the firmware decoders (one per captured block,
+# IR_DUMP rearms until the idle gap) and a dump line for the analyzer.
+# decoded counts the frames that came out (pulses for _parse_line), a call
+# may decode several frames or none.
+#   calls, decoded, calls_per_sec, us_per_call, us_per_decoded, worst_us, alloc_bytes_per_call
+# alloc_bytes_per_call is the mean peak of memory allocated during a call,
+# measured with tracemalloc in a separate run.
+
+_ANALYZER_CONFIGS = {
+    "aeha": AehaAnalyzerConfig,
+    "nec": NecAnalyzerConfig,
+}
+_DEFAULT_SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "samples")
+# generator.py input: protocol: the decoders that run on it. Key presses of
+# one frame and one repeat, from a fixed seed so runs compare.
+_GENERATED = {
+    "nec": ("nec_16", "multi"),
+    "aeha": ("aeha", "multi"),
+    "sony20": ("sony_20", "multi"),
+    "rc5": ("rc5", "multi"),
+    "rc6": ("rc6", "multi"),
+    "mce": ("mce", "multi"),
+}
+_GENERATED_PRESSES = 50
+_GENERATED_SEED = 1
+
+def _summarize(name: str, decode_ns: list[int], alloc_bytes: list[int], decoded: int) -> dict:
+    total_ns = sum(decode_ns)
+    calls = len(decode_ns)
+    return {
+        "name": name,
+        "calls": calls,
+        "decoded": decoded,
+        "calls_per_sec": round(calls * 1e9 / total_ns, 1) if total_ns > 0 else 0.0,
+        "us_per_call": round(total_ns / calls / 1000, 2) if calls > 0 else 0.0,
+        "us_per_decoded": round(total_ns / decoded / 1000, 2) if decoded > 0 else 0.0,
+        "worst_us": round(max(decode_ns) / 1000, 2) if calls > 0 else 0.0,
+        "alloc_bytes_per_call": round(sum(alloc_bytes) / len(alloc_bytes), 1) if alloc_bytes else 0.0,
+    }
+
+def bench_firmware(name: str, paths: list[str], repeat: int, label: str | None = None) -> dict:
+    decode_ns = []
+    decoded = 0
+    for _ in range(repeat):
+        report = replay_captures(name, paths)
+        decode_ns.extend(report.decode_ns)
+        decoded += report.frames
+    tracemalloc.start()
+    try:
+        alloc_bytes = replay_captures(name, paths, trace_allocations=True).decode_alloc_bytes
+    finally:
+        tracemalloc.stop()
+    return _summarize("firmware/" + (label or name), decode_ns, alloc_bytes, decoded)
+
+def _time_lines(lines: list[str], work: Callable[[str], None], repeat: int, trace_allocations: bool) -> tuple[list[int], list[int]]:
+    decode_ns = []
+    alloc_bytes = []
+    for _ in range(repeat):
+        for line in lines:
+            if trace_allocations:
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+            start = time.perf_counter_ns()
+            work(line)
+            decode_ns.append(time.perf_counter_ns() - start)
+            if trace_allocations:
+                _, peak = tracemalloc.get_traced_memory()
+                alloc_bytes.append(peak - before)
+    return decode_ns, alloc_bytes
+
+def _read_lines(paths: list[str]) -> list[str]:
+    # dump lines with pulses, the ones analyze() does work for
+    lines = []
+    for path in list_captures(paths):
+        if path.endswith(".txt"):
+            with open(path, "r") as f:
+                lines.extend(line for line in f if "/w:" in line)
+    return lines
+
+def bench_analyzer(protocol: str, paths: list[str], repeat: int, label: str | None = None) -> dict:
+    lines = _read_lines(paths)
+    config = _ANALYZER_CONFIGS[protocol]()
+    analyzer = IrSignalAnalyzer(config)
+    decode_ns, _ = _time_lines(lines, analyzer.analyze, repeat, False)
+    decoded = sum(1 for _ in analyzer.flush())
+    tracemalloc.start()
+    try:
+        _, alloc_bytes = _time_lines(lines, IrSignalAnalyzer(config).analyze, 1, True)
+    finally:
+        tracemalloc.stop()
+    return _summarize("analyzer/" + (label or protocol), decode_ns, alloc_bytes, decoded)
+
+def bench_parse_line(paths: list[str], repeat: int) -> dict:
+    lines = _read_lines(paths)
+    analyzer = IrSignalAnalyzer(AehaAnalyzerConfig())
+    decode_ns, _ = _time_lines(lines, analyzer._parse_line, repeat, False)
+    tracemalloc.start()
+    try:
+        _, alloc_bytes = _time_lines(lines, analyzer._parse_line, 1, True)
+    finally:
+        tracemalloc.stop()
+    pulses = sum(1 for _ in iter_dump_pulses(lines)) * repeat
+    return _summarize("analyzer/_parse_line", decode_ns, alloc_bytes, pulses)
+
+def bench_generated(directory: str, repeat: int) -> list[dict]:
+    # the decoders on generator.py dumps, so protocols the samples lack are covered
+    results = []
+    for protocol, decoders in _GENERATED.items():
+        train = generator.generate(protocol, _GENERATED_PRESSES, np.random.default_rng(_GENERATED_SEED), 1)
+        path = os.path.join(directory, protocol + ".txt")
+        with open(path, "w") as f:
+            generator.write_dump(train, f)
+        for name in decoders:
+            results.append(bench_firmware(name, [path], repeat, "{}/generated-{}".format(name, protocol)))
+        if protocol in _ANALYZER_CONFIGS:
+            results.append(bench_analyzer(protocol, [path], repeat, "{}/generated-{}".format(protocol, protocol)))
+    return results
+
+def run_benchmarks(paths: list[str], repeat: int) -> dict:
+    results = [bench_firmware(name, paths, repeat) for name in DECODERS]
+    results.extend(bench_analyzer(protocol, paths, repeat) for protocol in _ANALYZER_CONFIGS)
+    results.append(bench_parse_line(paths, repeat))
+    with tempfile.TemporaryDirectory() as directory:
+        results.extend(bench_generated(directory, repeat))
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeat": repeat,
+        "captures": list_captures(paths),
+        "generated": {protocol: _GENERATED_PRESSES for protocol in _GENERATED},
+        "results": results,
+    }
+
+def compare(baseline: dict, current: dict) -> None:
+    # us_per_decoded and worst_us relative to the baseline run. Baselines
+    # from before the fields were renamed have no us_per_decoded.
+    before = {result["name"]: result for result in baseline["results"]}
+    for result in current["results"]:
+        old = before.get(result["name"])
+        if old is None or not old.get("us_per_decoded") or old["worst_us"] == 0:
+            continue
+        print("{:34} {:+7.1f}% us/decoded {:+7.1f}% worst {:+7.1f} alloc bytes/call".format(result["name"],
+              (result["us_per_decoded"] / old["us_per_decoded"] - 1) * 100, (result["worst_us"] / old["worst_us"] - 1) * 100,
+              result["alloc_bytes_per_call"] - old["alloc_bytes_per_call"]), file=sys.stderr)
+
+def print_usage() -> None:
+    print("usage: python {} [-n REPEAT] [--compare BASELINE.json] [PATH...] > bench.json".format(args[0]))
+    print("       PATH defaults to tools/samples, generator.py dumps of {} are benchmarked too".format(", ".join(_GENERATED)))
+
+if __name__ == "__main__":
+    try:
+        args = sys.argv
+        options = args[1:]
+        repeat = 5
+        baseline = None
+        if len(options) >= 2 and options[0] == "-n":
+            repeat = int(options[1])
+            options = options[2:]
+        if len(options) >= 2 and options[0] == "--compare":
+            with open(options[1], "r") as f:
+                baseline = json.load(f)
+            options = options[2:]
+        if any(option.startswith("-") for option in options) or repeat < 1:
+            print_usage()
+            exit(1)
+        report = run_benchmarks(options or [_DEFAULT_SAMPLES], repeat)
+        json.dump(report, sys.stdout, indent=1)
+        print()
+        if baseline is not None:
+            compare(baseline, report)
+    except KeyboardInterrupt:
+        pass
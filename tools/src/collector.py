@@ -0,0 +1,120 @@
+import hashlib
+import hmac
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from common import IrFrameBatch, read_frame_batches, read_frame_records
+from detect import get_protocol_name
+
+# must be kept in sync with the "collector" port in resources/config.json
+DEFAULT_PORT = 5140
+# records per batch sent by send_capture, like a busy scanner
+_SEND_BATCH_RECORDS = 8
+
+class BatchVerifier:
+    # The keyed HMAC is built once, every batch only copies its pad state
+    def __init__(self, key: bytes) -> None:
+        self._hmac = hmac.new(key, digestmod=hashlib.sha256)
+
+    def sign(self, batch: IrFrameBatch) -> bytes:
+        h = self._hmac.copy()
+        h.update(batch.get_header(True))
+        h.update(batch.payload)
+        return h.digest()
+
+    def verify(self, batch: IrFrameBatch) -> bool:
+        return batch.mac is not None and hmac.compare_digest(self.sign(batch), batch.mac)
+
+def load_key(config_path: str) -> bytes | None:
+    # the scanner's resources/config.json, an empty key means unsigned batches
+    with open(config_path, "r") as f:
+        key = json.load(f).get("collector", {}).get("key", "")
+    return key.encode() if key else None
+
+class CollectorHandler(socketserver.StreamRequestHandler):
+    # One connection per scanner. The records of every batch are appended to
+    # DIRECTORY/<scanner address>.bin, which analyzer.py --binary and batch.py read.
+    # With a key, batches without a valid MAC are dropped.
+    def handle(self) -> None:
+        scanner = self.client_address[0]
+        path = os.path.join(self.server.directory, "{}.bin".format(scanner))
+        expected_seq = None
+        try:
+            with open(path, "ab") as f:
+                for batch in read_frame_batches(self.rfile):
+                    if self.server.verifier is not None and not self.server.verifier.verify(batch):
+                        self.server.log("{} batch {}: bad MAC, dropped".format(scanner, batch.seq))
+                        continue
+                    records = list(batch.records())
+                    if len(records) != batch.nrecords:
+                        self.server.log("{} batch {}: {} of {} records are broken".format(scanner, batch.seq, batch.nrecords - len(records), batch.nrecords))
+                    if expected_seq is not None and batch.seq != expected_seq:
+                        self.server.log("{} batch {}: {} batch(es) lost".format(scanner, batch.seq, (batch.seq - expected_seq) & 0xffff))
+                    expected_seq = (batch.seq + 1) & 0xffff
+                    f.write(batch.payload)
+                    f.flush()
+                    protocols = sorted(set(get_protocol_name(record.protocol) for record in records))
+                    self.server.log("{} batch {}: {} frames ({})".format(scanner, batch.seq, len(records), ", ".join(protocols)))
+        except (ValueError, ConnectionError) as e:
+            self.server.log("{} disconnected: {}".format(scanner, e))
+
+class Collector(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, port: int, directory: str, key: bytes | None = None) -> None:
+        super().__init__(("", port), CollectorHandler)
+        self.directory = directory
+        self.verifier = BatchVerifier(key) if key is not None else None
+        self._lock = threading.Lock()
+
+    def log(self, message: str) -> None:
+        with self._lock:
+            print(message)
+            sys.stdout.flush()
+
+def send_capture(host: str, port: int, path: str, key: bytes | None = None) -> int:
+    # Stand-in for a scanner: sends the records of a .bin capture in batches,
+    # to try the collector without a Pico. Returns the number of batches.
+    with open(path, "rb") as f:
+        records = list(read_frame_records(f))
+    signer = BatchVerifier(key) if key is not None else None
+    seq = 0
+    with socket.create_connection((host, port)) as s:
+        for start in range(0, len(records), _SEND_BATCH_RECORDS):
+            chunk = records[start:start + _SEND_BATCH_RECORDS]
+            batch = IrFrameBatch(seq, len(chunk), b"".join(record.pack() for record in chunk))
+            if signer is not None:
+                batch.mac = signer.sign(batch)
+            s.sendall(batch.pack())
+            seq += 1
+    return seq
+
+def print_usage() -> None:
+    print("usage: python {} serve [PORT] [DIRECTORY] [--config resources/config.json]".format(args[0]))
+    print("       python {} send HOST PORT DATA.bin [--config resources/config.json]".format(args[0]))
+    print("       --config takes the batch signing key from the scanner config")
+
+if __name__ == "__main__":
+    try:
+        args = sys.argv
+        key = None
+        if len(args) >= 3 and args[-2] == "--config":
+            key = load_key(args[-1])
+            args = args[:-2]
+        if len(args) >= 2 and args[1] == "serve" and len(args) <= 4:
+            port = int(args[2]) if len(args) >= 3 else DEFAULT_PORT
+            directory = args[3] if len(args) >= 4 else "."
+            os.makedirs(directory, exist_ok=True)
+            with Collector(port, directory, key) as collector:
+                collector.serve_forever()
+        elif len(args) == 5 and args[1] == "send":
+            print("sent {} batches".format(send_capture(args[2], int(args[3]), args[4], key)))
+        else:
+            print_usage()
+            exit(1)
+    except KeyboardInterrupt:
+        pass
@@ -1,4 +1,14 @@
-from typing import Callable
+import io
+import math
+import os
+import struct
+import sys
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+# lib/ holds modules shared with the firmware (ir_detect, ir_pdm)
+LIB_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "lib"))
+if LIB_DIR not in sys.path:
+    sys.path.append(LIB_DIR)
 
 class IrFramePartElement:
     def __init__(self) -> None:
@@ -59,6 +69,9 @@ class IrFrameIntermediatePartElement(IrFramePartElement):
     def has_part_ended(self) -> bool:
         return self._read_bits == self._data_len
 
+    def get_data_len(self) -> int:
+        return self._data_len
+
     def store_bit(self, bit: bool) -> None:
         if self._read_bits == 0:
             self._data = int(bit)
@@ -74,12 +87,176 @@ class IrFrameIntermediatePartElement(IrFramePartElement):
         super().reset()
         self._data = None
 
+class IrFrameRawPartElement(IrFramePartElement):
+    # holds a value decoded elsewhere so that frame builders can consume it
+    def __init__(self, raw: int | list[int] | None) -> None:
+        super().__init__()
+        self._raw = raw
+
+    def get_raw(self) -> int | list[int]:
+        return self._raw
+
 class IrPulse:
     def __init__(self, start_offset_us: int, duration_us: int) -> None:
         self.raise_us = start_offset_us # from start offset
         self.fall_us = self.raise_us + duration_us # from start offset
         self.duration_us = duration_us
 
+def parse_dump_line(line: str) -> Iterator[IrPulse]:
+    start_pos = line.find("] ") + 1
+    for data_pair in line[start_pos:].split(","):
+        if data_pair.find("/") == -1:
+            continue
+        [offset_pair, width_pair] = data_pair.split("/", 2)
+        offset_value = int(offset_pair.split(":", 2)[1])
+        width_value = int(width_pair.split(":", 2)[1])
+        yield IrPulse(offset_value, width_value)
+
+def iter_dump_pulses(lines: Iterable[str]) -> Iterator[IrPulse]:
+    for line in lines:
+        yield from parse_dump_line(line)
+
+class IrFrameRecord:
+    # must be kept in sync with Formatter.RECORD_* in src/Formatter.py.
+    # protocol is an ir_detect protocol id (lib/ir_detect.py)
+    MAGIC = b"IR"
+    VERSION = 1
+    HEADER = struct.Struct("<2sBBIHH")
+
+    def __init__(self, received_time: int, protocol: int, edges: list[int]) -> None:
+        self.received_time = received_time
+        self.protocol = protocol
+        self.edges = edges # from the first edge
+
+    def pulses(self) -> Iterator[IrPulse]:
+        edges = self.edges
+        for edge in range(0, len(edges), 2):
+            # -1 if the signal has never been fall down
+            width = edges[edge + 1] - edges[edge] if edge + 1 < len(edges) else -1
+            yield IrPulse(edges[edge], width)
+
+    def pack(self) -> bytes:
+        payload = bytearray()
+        for before, edge in zip(self.edges, self.edges[1:]):
+            delta = max(0, edge - before)
+            while delta > 0x7f:
+                payload.append((delta & 0x7f) | 0x80)
+                delta >>= 7
+            payload.append(delta)
+        return IrFrameRecord.HEADER.pack(IrFrameRecord.MAGIC, IrFrameRecord.VERSION, self.protocol, self.received_time, len(self.edges), len(payload)) + payload
+
+def _decode_varints(payload: bytes, count: int) -> list[int] | None:
+    edges = [0]
+    value = 0
+    shift = 0
+    offset = 0
+    for byte in payload:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            offset += value
+            edges.append(offset)
+            value = 0
+            shift = 0
+    if shift != 0 or len(edges) != count:
+        return None
+    return edges
+
+def read_frame_records(stream: BinaryIO, chunk_size: int = 4096) -> Iterator[IrFrameRecord]:
+    # Text printed by the scanner may be interleaved with records on the same
+    # serial line, so anything that does not start with a valid header is skipped.
+    header_size = IrFrameRecord.HEADER.size
+    buf = b""
+    eof = False
+    read = getattr(stream, "read1", stream.read)
+    while True:
+        pos = buf.find(IrFrameRecord.MAGIC)
+        if pos < 0:
+            buf = buf[-1:]
+        else:
+            buf = buf[pos:]
+            if len(buf) >= header_size:
+                [_, version, protocol, received, nedges, payload_len] = IrFrameRecord.HEADER.unpack_from(buf)
+                if version != IrFrameRecord.VERSION or nedges == 0:
+                    buf = buf[1:]
+                    continue
+                if len(buf) >= header_size + payload_len:
+                    edges = _decode_varints(buf[header_size:header_size + payload_len], nedges)
+                    if edges is None:
+                        buf = buf[1:]
+                        continue
+                    buf = buf[header_size + payload_len:]
+                    yield IrFrameRecord(received, protocol, edges)
+                    continue
+        if eof:
+            return
+        chunk = read(chunk_size)
+        if not chunk:
+            eof = True
+        buf += chunk
+
+class IrFrameBatch:
+    # must be kept in sync with Formatter.BATCH_* in src/Formatter.py.
+    # payload is nrecords frame records as written by Formatter.format_record.
+    # mac is the HMAC-SHA256 of header and payload of a signed batch.
+    MAGIC = b"IB"
+    VERSION = 1
+    SIGNED_VERSION = 2
+    HEADER = struct.Struct("<2sBBHH")
+    MAC_SIZE = 32
+
+    def __init__(self, seq: int, nrecords: int, payload: bytes, mac: bytes | None = None) -> None:
+        self.seq = seq
+        self.nrecords = nrecords
+        self.payload = payload
+        self.mac = mac
+
+    def get_header(self, signed: bool) -> bytes:
+        version = IrFrameBatch.SIGNED_VERSION if signed else IrFrameBatch.VERSION
+        return IrFrameBatch.HEADER.pack(IrFrameBatch.MAGIC, version, self.nrecords, self.seq & 0xffff, len(self.payload))
+
+    def pack(self) -> bytes:
+        return self.get_header(self.mac is not None) + self.payload + (self.mac or b"")
+
+    def records(self) -> Iterator[IrFrameRecord]:
+        return read_frame_records(io.BytesIO(self.payload))
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes | None:
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+def read_frame_batches(stream: BinaryIO) -> Iterator[IrFrameBatch]:
+    # Batches come over TCP, so unlike serial records there is nothing to
+    # resync on: a bad header ends the stream.
+    while True:
+        header = _read_exactly(stream, IrFrameBatch.HEADER.size)
+        if header is None:
+            return
+        [magic, version, nrecords, seq, payload_len] = IrFrameBatch.HEADER.unpack(header)
+        if magic != IrFrameBatch.MAGIC or version not in (IrFrameBatch.VERSION, IrFrameBatch.SIGNED_VERSION):
+            raise ValueError("not a frame batch")
+        payload = _read_exactly(stream, payload_len + (IrFrameBatch.MAC_SIZE if version == IrFrameBatch.SIGNED_VERSION else 0))
+        if payload is None:
+            return
+        if version == IrFrameBatch.SIGNED_VERSION:
+            yield IrFrameBatch(seq, nrecords, payload[:payload_len], payload[payload_len:])
+        else:
+            yield IrFrameBatch(seq, nrecords, payload)
+
+def read_pulses(stream: BinaryIO) -> Iterator[IrPulse]:
+    for record in read_frame_records(stream):
+        yield from record.pulses()
+
+def format_bits(value: int | None, width: int) -> str:
+    # "" for a part that has not received any bit
+    return "{:0{}b}".format(value, width) if value is not None else ""
+
 class IrFrame:
     def __init__(self, elements: list[IrFramePartElement]) -> None:
         pass
@@ -87,8 +264,186 @@ class IrFrame:
     def dump(self) -> str:
         pass
 
+    def get_fields(self) -> list[tuple[str, str]]:
+        # (name, bits) in the order received
+        return []
+
+    def get_key(self) -> tuple:
+        # index key of golden frames
+        return ()
+
+    def get_bits(self) -> str:
+        return "".join(bits for _, bits in self.get_fields())
+
+class IrTimeWindow:
+    IN = 0
+    WARNING = 1
+    OUT = 2
+
+    # Integer bounds of nominal_us +- rate. A measured time inside the allowed
+    # band matches silently, inside the warning band it matches with a warning.
+    def __init__(self, nominal_us: int, allowed_rate: float, warning_rate: float) -> None:
+        self.nominal_us = nominal_us
+        self.allowed_lo_us, self.allowed_hi_us = self._bounds(nominal_us, allowed_rate)
+        self.warning_lo_us, self.warning_hi_us = self._bounds(nominal_us, warning_rate)
+
+    def classify(self, measured_us: int) -> int:
+        if measured_us < self.warning_lo_us or measured_us > self.warning_hi_us:
+            return IrTimeWindow.OUT
+        if measured_us < self.allowed_lo_us or measured_us > self.allowed_hi_us:
+            return IrTimeWindow.WARNING
+        return IrTimeWindow.IN
+
+    def _bounds(self, nominal_us: int, rate: float) -> tuple[int, int]:
+        # largest deviation whose float rate still passes, so that the bounds
+        # match the "abs(diff) / nominal > rate" check exactly
+        deviation_us = int(nominal_us * rate) + 1
+        while deviation_us > 0 and deviation_us / nominal_us > rate:
+            deviation_us -= 1
+        return nominal_us - deviation_us, nominal_us + deviation_us
+
+class TimingHistogram:
+    # Streaming statistics of one symbol class. The deviation from the
+    # nominal time is counted in fixed bins, so memory does not depend on
+    # the number of samples and histograms of several files can be merged.
+    BIN_US = 10
+    SPAN_US = 500
+    _NUM_OF_BINS = 2 * SPAN_US // BIN_US + 1
+
+    def __init__(self, nominal_us: int) -> None:
+        self.nominal_us = nominal_us
+        self.count = 0
+        self.sum_us = 0
+        self.sum_sq_us = 0
+        self.min_us = None
+        self.max_us = None
+        self.underflow = 0
+        self.overflow = 0
+        self.bins = [0] * TimingHistogram._NUM_OF_BINS
+
+    def add(self, measured_us: int) -> None:
+        self.count += 1
+        self.sum_us += measured_us
+        self.sum_sq_us += measured_us * measured_us
+        if self.min_us is None or measured_us < self.min_us:
+            self.min_us = measured_us
+        if self.max_us is None or measured_us > self.max_us:
+            self.max_us = measured_us
+        # bin 0 is centered on -SPAN_US, the middle bin on the nominal time
+        index = (measured_us - self.nominal_us + TimingHistogram.SPAN_US + TimingHistogram.BIN_US // 2) // TimingHistogram.BIN_US
+        if index < 0:
+            self.underflow += 1
+        elif index >= TimingHistogram._NUM_OF_BINS:
+            self.overflow += 1
+        else:
+            self.bins[index] += 1
+
+    def merge(self, other: "TimingHistogram") -> None:
+        self.count += other.count
+        self.sum_us += other.sum_us
+        self.sum_sq_us += other.sum_sq_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        if other.max_us is not None and (self.max_us is None or other.max_us > self.max_us):
+            self.max_us = other.max_us
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        for index, count in enumerate(other.bins):
+            self.bins[index] += count
+
+    def get_mean_us(self) -> float:
+        return self.sum_us / self.count
+
+    def get_sd_us(self) -> float:
+        mean_us = self.get_mean_us()
+        return math.sqrt(max(0.0, self.sum_sq_us / self.count - mean_us * mean_us))
+
+    def get_percentile_us(self, percent: float) -> int:
+        # the center of the bin holding the sample, limited to the seen range
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = self.underflow
+        if rank <= seen:
+            return self.min_us
+        for index, count in enumerate(self.bins):
+            seen += count
+            if rank <= seen:
+                center_us = self.nominal_us - TimingHistogram.SPAN_US + index * TimingHistogram.BIN_US
+                return min(max(center_us, self.min_us), self.max_us)
+        return self.max_us
+
+    def to_dict(self) -> dict:
+        return {
+            "nominal_us": self.nominal_us,
+            "count": self.count,
+            "mean_us": round(self.get_mean_us(), 1),
+            "sd_us": round(self.get_sd_us(), 1),
+            "min_us": self.min_us,
+            "max_us": self.max_us,
+            "p50_us": self.get_percentile_us(50),
+            "p90_us": self.get_percentile_us(90),
+            "p99_us": self.get_percentile_us(99),
+            "histogram": {
+                "bin_us": TimingHistogram.BIN_US,
+                "first_us": self.nominal_us - TimingHistogram.SPAN_US,
+                "underflow": self.underflow,
+                "overflow": self.overflow,
+                "bins": self.bins,
+            },
+        }
+
+class TimingStatistics:
+    # symbol class (leader, frame_low, repeat_low, bit0, bit1, mark) -> histogram
+    def __init__(self) -> None:
+        self.histograms = {}
+
+    def add(self, symbol: str, nominal_us: int, measured_us: int) -> None:
+        histogram = self.histograms.get(symbol)
+        if histogram is None:
+            histogram = self.histograms[symbol] = TimingHistogram(nominal_us)
+        histogram.add(measured_us)
+
+    def merge(self, other: "TimingStatistics") -> None:
+        for symbol, other_histogram in other.histograms.items():
+            histogram = self.histograms.get(symbol)
+            if histogram is None:
+                histogram = self.histograms[symbol] = TimingHistogram(other_histogram.nominal_us)
+            histogram.merge(other_histogram)
+
+    def to_dict(self) -> dict:
+        return {symbol: histogram.to_dict() for symbol, histogram in sorted(self.histograms.items())}
+
 class IrSignalAnalyzerConfig:
+    ALLOWED_ERROR_RATE = 0.1
+    WARNING_ERROR_RATE = 0.2
+
+    # bit gap classes of bit_gap_table
+    BIT0 = 0
+    BIT0_WARNING = 1
+    BIT1 = 2
+    BIT1_WARNING = 3
+    BIT_UNEXPECTED = 4
+
     def __init__(self, t_us: int, elements: list[IrFramePartElement], frame_builder: Callable[[list[IrFramePartElement]], IrFrame]) -> None:
         self.t_us = t_us
         self.elements = elements
         self.frame_builder = frame_builder
+        leader = elements[0]
+        self.leader_high = self._window(leader.get_high_t() * t_us)
+        self.frame_low = self._window(leader.get_frame_low_t() * t_us)
+        self.repeat_low = self._window(leader.get_repeat_low_t() * t_us)
+        self.bit0_gap = self._window(t_us)
+        self.bit1_gap = self._window(t_us * 3)
+        # gap us -> bit class, gaps beyond the table are unexpected
+        self.bit_gap_table = bytes(self._classify_bit_gap(gap_us) for gap_us in range(self.bit1_gap.warning_hi_us + 1))
+
+    def _window(self, nominal_us: int) -> IrTimeWindow:
+        return IrTimeWindow(nominal_us, IrSignalAnalyzerConfig.ALLOWED_ERROR_RATE, IrSignalAnalyzerConfig.WARNING_ERROR_RATE)
+
+    def _classify_bit_gap(self, gap_us: int) -> int:
+        bit0 = self.bit0_gap.classify(gap_us)
+        if bit0 != IrTimeWindow.OUT:
+            return IrSignalAnalyzerConfig.BIT0 if bit0 == IrTimeWindow.IN else IrSignalAnalyzerConfig.BIT0_WARNING
+        bit1 = self.bit1_gap.classify(gap_us)
+        if bit1 != IrTimeWindow.OUT:
+            return IrSignalAnalyzerConfig.BIT1 if bit1 == IrTimeWindow.IN else IrSignalAnalyzerConfig.BIT1_WARNING
+        return IrSignalAnalyzerConfig.BIT_UNEXPECTED
@@ -0,0 +1,92 @@
+import operator
+from typing import Iterable, Iterator
+from common import IrFrame, IrFrameIntermediatePartElement, IrFrameRawPartElement, IrPulse, IrSignalAnalyzerConfig, LeaderPartElement, parse_dump_line
+from aeha import AehaDataPartElement
+from analyzer import IrSignalAnalyzer
+from ir_pdm import PulseDistanceDecoder
+
+class CompiledIrSignalAnalyzer:
+    # Decodes with the table driven ir_pdm state machine, compiled from the
+    # same spec the firmware uses. The spec is read from the config elements,
+    # so frames are identical to IrSignalAnalyzer's, without per-gap warnings.
+    _FEED_CHUNK = 1024
+    def __init__(self, config: IrSignalAnalyzerConfig) -> None:
+        self._frame_builder = config.frame_builder
+        self._leader = None
+        self._widths = []
+        for element in config.elements:
+            element.accept(self)
+        trailer_us = IrSignalAnalyzer._FRAME_END_GAP_US if 0 in self._widths else 0
+        spec = (config.t_us, self._leader.get_high_t(), self._leader.get_frame_low_t(), self._leader.get_repeat_low_t(), tuple(self._widths), trailer_us)
+        self._decoder = PulseDistanceDecoder(spec, self._on_frame)
+        self._frames = []
+
+    def visitLeader(self, element: LeaderPartElement) -> None:
+        self._leader = element
+
+    def visitIntermediate(self, element: IrFrameIntermediatePartElement) -> None:
+        self._widths.append(element.get_data_len())
+
+    def visitData(self, element: AehaDataPartElement) -> None:
+        self._widths.append(0)
+
+    def analyze(self, line: str) -> None:
+        self.analyze_pulses(parse_dump_line(line))
+
+    def analyze_pulses(self, pulses: Iterable[IrPulse]) -> None:
+        edges = []
+        for pulse in pulses:
+            edges.append(pulse.raise_us)
+            if pulse.duration_us < 0:
+                # a mark that never fell (w: -1) ends its capture like
+                # detect.split_bursts. Without its fall the next pulses would
+                # be paired mark/space the wrong way round, so they start over.
+                self._decoder.decode(edges, len(edges), operator.sub)
+                self._decoder.end()
+                self._decoder.reset()
+                edges = []
+            else:
+                edges.append(pulse.fall_us)
+        self._decoder.decode(edges, len(edges), operator.sub)
+
+    def stream(self, pulses: Iterable[IrPulse]) -> Iterator[IrFrame]:
+        yield from self.feed(pulses)
+        yield from self.flush()
+
+    def feed(self, pulses: Iterable[IrPulse]) -> Iterator[IrFrame]:
+        # the decoder loop runs over chunks of pulses, frames are yielded
+        # after each chunk
+        chunk = []
+        for pulse in pulses:
+            chunk.append(pulse)
+            if len(chunk) == CompiledIrSignalAnalyzer._FEED_CHUNK:
+                self.analyze_pulses(chunk)
+                chunk = []
+                while self._frames:
+                    yield self._frames.pop(0)
+        self.analyze_pulses(chunk)
+        while self._frames:
+            yield self._frames.pop(0)
+
+    def flush(self) -> Iterator[IrFrame]:
+        self.finalize()
+        while self._frames:
+            yield self._frames.pop(0)
+
+    def finalize(self) -> None:
+        self._decoder.end()
+
+    def dump(self) -> None:
+        for frame in self._frames:
+            frame.dump()
+
+    def _on_frame(self, decoder: PulseDistanceDecoder, repeat: bool) -> None:
+        if repeat:
+            return
+        elements = [self._leader]
+        for value, count in zip(decoder.fields, decoder.counts):
+            elements.append(IrFrameRawPartElement(value if count > 0 else None))
+        if 0 in self._widths:
+            data = list(decoder.data[:(decoder.nbits + 7) // 8])
+            elements.append(IrFrameRawPartElement(data))
+        self._frames.append(self._frame_builder(elements))
@@ -0,0 +1,69 @@
+import os
+import sys
+from common import iter_dump_pulses
+from aeha import AehaAnalyzerConfig
+from nec import NecAnalyzerConfig
+from analyzer import IrSignalAnalyzer
+from batch import list_captures
+from compiled import CompiledIrSignalAnalyzer
+from vectorized import VectorizedIrSignalAnalyzer
+
+# The vectorized and the compiled analyzer must decode the same frames as
+# IrSignalAnalyzer. Every capture is decoded by all three and compared, and
+# so are the dump texts below, which cover cases the samples lack.
+
+_CONFIGS = {
+    "aeha": AehaAnalyzerConfig,
+    "nec": NecAnalyzerConfig,
+}
+_FAN_SWING = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "samples", "fan", "swing-success1.txt")
+# (name, function of the sample texts that builds a dump text)
+_CASES = [
+    # a mark that never fell (w: -1) before two frames
+    ("unfallen mark", lambda read: "[x] o:     0/w: 300, o:  1000/w:  -1\n" + read(_FAN_SWING) * 2),
+]
+
+def decode(text: str, protocol: str) -> dict[str, list[str]]:
+    config = _CONFIGS[protocol]
+    analyzer = IrSignalAnalyzer(config())
+    frames = {"analyzer": [frame.get_bits() for frame in analyzer.stream(iter_dump_pulses(text.splitlines()))]}
+    compiled = CompiledIrSignalAnalyzer(config())
+    frames["compiled"] = [frame.get_bits() for frame in compiled.stream(iter_dump_pulses(text.splitlines()))]
+    vectorized = VectorizedIrSignalAnalyzer(config())
+    vectorized.load_text(text)
+    vectorized.analyze()
+    frames["vectorized"] = [frame.get_bits() for frame in vectorized.get_frames()]
+    return frames
+
+def check(name: str, text: str) -> bool:
+    ok = True
+    for protocol in _CONFIGS:
+        frames = decode(text, protocol)
+        for analyzer in ("compiled", "vectorized"):
+            if frames[analyzer] != frames["analyzer"]:
+                print("{} {}: {} decoded {} frame(s), analyzer {}".format(name, protocol, analyzer, len(frames[analyzer]), len(frames["analyzer"])))
+                ok = False
+    return ok
+
+def read(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+def print_usage() -> None:
+    print("usage: python {} [PATH...]".format(args[0]))
+    print("       compares the frames of analyzer.py, --vectorized and --compiled on every capture in PATH")
+    print("       and on built-in cases, exits with 1 if any differ")
+
+if __name__ == "__main__":
+    args = sys.argv
+    if "-h" in args[1:]:
+        print_usage()
+        exit(0)
+    ok = True
+    for name, build in _CASES:
+        ok = check(name, build(read)) and ok
+    for path in list_captures(args[1:]):
+        if path.endswith(".txt"):
+            ok = check(path, read(path)) and ok
+    print("ok" if ok else "mismatch")
+    exit(0 if ok else 1)
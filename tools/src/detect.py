@@ -0,0 +1,69 @@
+import operator
+from collections import Counter
+from typing import Iterable, Iterator
+from common import IrFrame, IrPulse, IrSignalAnalyzerConfig, TimingStatistics
+from aeha import AehaAnalyzerConfig
+from nec import NecAnalyzerConfig
+from analyzer import IrSignalAnalyzer
+import ir_detect
+
+_CONFIGS = {
+    ir_detect.AEHA: AehaAnalyzerConfig,
+    ir_detect.NEC: NecAnalyzerConfig,
+}
+
+def get_protocol_name(protocol: int) -> str:
+    return ir_detect.NAMES[protocol]
+
+def get_config(protocol: int) -> IrSignalAnalyzerConfig | None:
+    config_class = _CONFIGS.get(protocol)
+    return config_class() if config_class is not None else None
+
+def classify_pulses(pulses: list[IrPulse]) -> int:
+    edges = []
+    for pulse in pulses:
+        edges.append(pulse.raise_us)
+        if pulse.duration_us >= 0:
+            edges.append(pulse.fall_us)
+    return ir_detect.classify(edges, len(edges), operator.sub)
+
+def split_bursts(pulses: Iterable[IrPulse]) -> Iterator[list[IrPulse]]:
+    # a new dump restarts the offsets, which shows up as a negative gap
+    burst = []
+    for pulse in pulses:
+        if len(burst) > 0:
+            gap_us = pulse.raise_us - burst[-1].fall_us
+            if gap_us >= ir_detect.BURST_GAP or gap_us < 0:
+                yield burst
+                burst = []
+        burst.append(pulse)
+    if len(burst) > 0:
+        yield burst
+
+def stream_mixed(pulses: Iterable[IrPulse], warnings: Counter | None = None, timings: dict[str, TimingStatistics] | None = None) -> Iterator[tuple[int, IrFrame]]:
+    # Each burst is classified and fed to the analyzer of its protocol.
+    # Unknown bursts (noise, damaged frames) stay with the current protocol,
+    # so a single protocol capture is decoded exactly like a fixed config.
+    # timings collects the timing statistics per protocol name.
+    protocol = ir_detect.UNKNOWN
+    analyzer = None
+    for burst in split_bursts(pulses):
+        burst_protocol = classify_pulses(burst)
+        if burst_protocol != ir_detect.UNKNOWN and burst_protocol != protocol:
+            if analyzer is not None:
+                for frame in analyzer.flush():
+                    yield protocol, frame
+            protocol = burst_protocol
+            config = get_config(protocol)
+            if config is None:
+                analyzer = None
+            elif timings is None:
+                analyzer = IrSignalAnalyzer(config, warnings)
+            else:
+                analyzer = IrSignalAnalyzer(config, warnings, timings.setdefault(get_protocol_name(protocol), TimingStatistics()))
+        if analyzer is not None:
+            for frame in analyzer.feed(burst):
+                yield protocol, frame
+    if analyzer is not None:
+        for frame in analyzer.flush():
+            yield protocol, frame
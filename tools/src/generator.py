@@ -0,0 +1,300 @@
+import sys
+from typing import BinaryIO, Iterator, TextIO
+import numpy as np
+from common import IrFrameRecord, IrPulse
+import ir_detect
+import ir_pdm
+
+# Synthetic pulse trains with known content. All transmissions of a chunk are
+# built at once as arrays: pulse distance/width protocols as a matrix of
+# durations (every frame has the same number of edges), bi-phase protocols
+# as a matrix of half-bit levels whose changes are the edges.
+
+# (ir_detect protocol, bits per frame, modulation), T and leader timings come
+# from ir_detect.PROTOCOLS, the NEC/AEHA field widths from the ir_pdm specs.
+PROTOCOLS = {
+    "nec": (ir_detect.NEC, sum(ir_pdm.NEC[4]), "distance"),
+    "aeha": (ir_detect.AEHA, sum(ir_pdm.AEHA[4]), "distance"),
+    "sony12": (ir_detect.SONY, 12, "width"),
+    "sony15": (ir_detect.SONY, 15, "width"),
+    "sony20": (ir_detect.SONY, 20, "width"),
+    "rc5": (ir_detect.RC5, 14, "biphase"),
+    "rc6": (ir_detect.RC6, 17, "biphase"),
+    "mce": (ir_detect.MCE, 16, "biphase"),
+}
+
+# start to start time of repeated transmissions (NEC repeat codes, the
+# others resend the frame). AEHA frames are followed by a 35 ms gap instead.
+_PERIOD_MS = {"nec": 108, "sony12": 45, "sony15": 45, "sony20": 45, "rc5": 114, "rc6": 107, "mce": 64}
+_AEHA_GAP_US = 35000
+# gap before the next key press, longer than the 500 ms AEHA block
+_PRESS_GAP_US = 600000
+# IR_DUMP closes a capture after this idle time (src/dump.py _IDLE_MS)
+_CAPTURE_IDLE_US = 50000
+_GLITCH_US = (20, 120)
+
+def _timing(protocol: int) -> tuple[int, int, int, int]:
+    for proto, t_us, mark, space, rep, _, _ in ir_detect.PROTOCOLS:
+        if proto == protocol:
+            return t_us, mark, space, rep
+    raise ValueError(protocol)
+
+class PulseTrain:
+    # edges_us: edge times, even indices start a mark.
+    # start_us: start time of every transmission, repeat: whether it is a
+    # repeat, bits: the transmitted bits in the order they are sent (repeat
+    # codes and dropped frames keep the bits of the frame they repeat).
+    def __init__(self, protocol: str, edges_us: np.ndarray, start_us: np.ndarray, repeat: np.ndarray, bits: np.ndarray, end_us: int) -> None:
+        self.protocol = protocol
+        self.edges_us = edges_us
+        self.start_us = start_us
+        self.repeat = repeat
+        self.bits = bits
+        self.end_us = end_us
+
+    def pulses(self) -> Iterator[IrPulse]:
+        # offsets from the start of each capture, like the dump
+        for capture in self.captures():
+            for edge in range(0, len(capture), 2):
+                width = int(capture[edge + 1] - capture[edge]) if edge + 1 < len(capture) else -1
+                yield IrPulse(int(capture[edge]), width)
+
+    def get_capture_starts(self) -> np.ndarray:
+        # index of the first edge of every capture, split like IR_DUMP does
+        if len(self.edges_us) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([[0], np.flatnonzero(np.diff(self.edges_us) >= _CAPTURE_IDLE_US) + 1])
+
+    def captures(self) -> list[np.ndarray]:
+        # edges of every capture relative to its first edge
+        starts = self.get_capture_starts()
+        return [capture - capture[0] for capture in np.split(self.edges_us, starts[1:])]
+
+def _random_bits(name: str, count: int, nbytes: int, rng: np.random.Generator) -> np.ndarray:
+    _, nbits, _ = PROTOCOLS[name]
+    if name == "aeha":
+        nbits += nbytes * 8
+    bits = rng.integers(0, 2, size=(count, nbits), dtype=np.uint8)
+    if name == "nec":
+        # address, ~address, command, ~command so that NEC_8 accepts it
+        bits[:, 8:16] = 1 - bits[:, 0:8]
+        bits[:, 24:32] = 1 - bits[:, 16:24]
+    elif name == "aeha":
+        # parity is the xor of the customer code nibbles (bits sent LSB first)
+        bits[:, 16:20] = bits[:, 0:4] ^ bits[:, 4:8] ^ bits[:, 8:12] ^ bits[:, 12:16]
+    elif name == "rc5":
+        bits[:, 0] = 1  # start bit
+    elif name == "mce":
+        # LSB first, the top nibble is 4 + number of ones in the low 12 bits
+        checksum = (4 + bits[:, :12].sum(axis=1, dtype=np.int64)) & 0xf
+        bits[:, 12:16] = (checksum[:, None] >> np.arange(4)) & 1
+    return bits
+
+def _distance_offsets(name: str, bits: np.ndarray) -> tuple[np.ndarray, int]:
+    # edge offsets (count x edges) in us of pulse distance/width frames
+    protocol, _, modulation = PROTOCOLS[name]
+    t_us, mark, space, _ = _timing(protocol)
+    count, nbits = bits.shape
+    if modulation == "distance":
+        # mark 1T, space 1T (0) or 3T (1), then a stop mark
+        units = np.ones((count, 2 * nbits + 3), dtype=np.int64)
+        units[:, 3:2 * nbits + 2:2] = 1 + 2 * bits
+    else:
+        # Sony: mark 1T (0) or 2T (1), space 1T, no stop mark
+        units = np.ones((count, 2 * nbits + 1), dtype=np.int64)
+        units[:, 2::2] = 1 + bits
+    units[:, 0] = mark
+    units[:, 1] = space
+    offsets = np.zeros((count, units.shape[1] + 1), dtype=np.int64)
+    np.cumsum(units * t_us, axis=1, out=offsets[:, 1:])
+    return offsets, t_us
+
+def _biphase_levels(name: str, bits: np.ndarray) -> tuple[np.ndarray, int]:
+    # IR on (1) / off (0) per T, with an idle T before and after the frame
+    count, nbits = bits.shape
+    if name == "rc5":
+        # 1 is off-on, 0 is on-off
+        halves = np.stack([1 - bits, bits], axis=2).reshape(count, -1)
+        return np.pad(halves, ((0, 0), (1, 1))), _timing(ir_detect.RC5)[0]
+    if name == "rc6":
+        # leader 6T on 2T off, start bit 1, mode 000, toggle bit of 2T halves
+        # then 16 bits. 1 is on-off, 0 is off-on
+        data = np.stack([bits[:, 1:], 1 - bits[:, 1:]], axis=2).reshape(count, -1)
+        toggle = np.repeat(np.stack([bits[:, 0], 1 - bits[:, 0]], axis=1), 2, axis=1)
+        header = np.tile(np.array([0, 1, 1, 1, 1, 1, 1, 0, 0, 1, 0, 0, 1, 0, 1, 0, 1], dtype=np.uint8), (count, 1))
+        return np.concatenate([header, toggle, data, np.zeros((count, 1), dtype=np.uint8)], axis=1), _timing(ir_detect.RC6)[0]
+    # MCE: leader 4T on 1T off, start bit 1, 16 bits LSB first.
+    # 1 is off-on, 0 is on-off
+    data = np.stack([1 - bits, bits], axis=2).reshape(count, -1)
+    header = np.tile(np.array([0, 1, 1, 1, 1, 0, 0, 1], dtype=np.uint8), (count, 1))
+    return np.concatenate([header, data, np.zeros((count, 1), dtype=np.uint8)], axis=1), _timing(ir_detect.MCE)[0]
+
+def _frame_edges(name: str, bits: np.ndarray, start_us: np.ndarray) -> tuple[np.ndarray, int]:
+    # flat edge times of one frame per row of bits, and the frame length
+    if PROTOCOLS[name][2] == "biphase":
+        levels, t_us = _biphase_levels(name, bits)
+        rows, cols = np.nonzero(np.diff(levels, axis=1))
+        # the first change is at the end of the leading idle T
+        return start_us[rows] + cols * t_us, levels.shape[1] * t_us
+    offsets, _ = _distance_offsets(name, bits)
+    return (start_us[:, None] + offsets).ravel(), int(offsets[0, -1])
+
+def _repeat_code_edges(start_us: np.ndarray) -> np.ndarray:
+    # NEC repeat code: leader mark, repeat space, stop mark
+    t_us, mark, _, rep = _timing(ir_detect.NEC)
+    offsets = np.array([0, mark, mark + rep, mark + rep + 1], dtype=np.int64) * t_us
+    return (start_us[:, None] + offsets).ravel()
+
+def _impair(edges: np.ndarray, rng: np.random.Generator, jitter_us: float, glitch_rate: float, drop_rate: float) -> np.ndarray:
+    if drop_rate > 0:
+        # drop whole marks, the spaces around them merge
+        keep = rng.random(len(edges) // 2) >= drop_rate
+        edges = edges[:len(keep) * 2][np.repeat(keep, 2)]
+    if glitch_rate > 0 and len(edges) > 2:
+        # a short mark in the middle of a random part of a space
+        spaces = np.arange(1, len(edges) - 1, 2)
+        spaces = spaces[rng.random(len(spaces)) < glitch_rate]
+        width = rng.integers(_GLITCH_US[0], _GLITCH_US[1], size=len(spaces))
+        room = edges[spaces + 1] - edges[spaces] - width
+        fits = room > 2
+        spaces, width, room = spaces[fits], width[fits], room[fits]
+        glitch_start = edges[spaces] + 1 + (rng.random(len(spaces)) * (room - 1)).astype(np.int64)
+        values = np.stack([glitch_start, glitch_start + width], axis=1).ravel()
+        edges = np.insert(edges, np.repeat(spaces + 1, 2), values)
+    if jitter_us > 0:
+        edges = edges + np.rint(rng.normal(0, jitter_us, size=len(edges))).astype(np.int64)
+        # keep edges strictly increasing
+        index = np.arange(len(edges))
+        edges = np.maximum.accumulate(edges - index) + index
+    return edges
+
+def generate(name: str, count: int, rng: np.random.Generator | None = None, repeats: int = 0, period_ms: float | None = None,
+             nbytes: int = 6, jitter_us: float = 0.0, glitch_rate: float = 0.0, drop_rate: float = 0.0, start_us: int = 0) -> PulseTrain:
+    # count key presses of random frames, each followed by repeats repeated
+    # transmissions period_ms apart (start to start)
+    rng = rng if rng is not None else np.random.default_rng()
+    bits = _random_bits(name, count, nbytes, rng)
+    _, frame_us = _frame_edges(name, bits[:1], np.zeros(1, dtype=np.int64))
+    if period_ms is not None:
+        period_us = int(period_ms * 1000)
+    elif name == "aeha":
+        period_us = frame_us + _AEHA_GAP_US
+    else:
+        period_us = max(_PERIOD_MS[name] * 1000, frame_us + ir_detect.BURST_GAP)
+    press_us = frame_us + repeats * period_us + _PRESS_GAP_US
+    press_start_us = start_us + np.arange(count, dtype=np.int64) * press_us
+    transmission_us = (press_start_us[:, None] + np.arange(repeats + 1, dtype=np.int64) * period_us).ravel()
+    is_repeat = np.tile(np.arange(repeats + 1) > 0, count)
+    frame_bits = np.repeat(bits, repeats + 1, axis=0)
+    if name == "nec":
+        edges, _ = _frame_edges(name, bits, press_start_us)
+        edges = np.sort(np.concatenate([edges, _repeat_code_edges(transmission_us[is_repeat])]))
+    else:
+        edges, _ = _frame_edges(name, frame_bits, transmission_us)
+    edges = _impair(edges, rng, jitter_us, glitch_rate, drop_rate)
+    return PulseTrain(name, edges, transmission_us, is_repeat, frame_bits, start_us + count * press_us)
+
+def write_dump(train: PulseTrain, f: TextIO, received_time: str = "2024-01-01 00:00:00Z") -> None:
+    # the o:/w: text of IR_DUMP._print_frame, one block per capture
+    for capture in train.captures():
+        offsets = capture[0::2]
+        widths = np.full(len(offsets), -1, dtype=np.int64)
+        widths[:len(capture) // 2] = capture[1::2] - capture[0:len(capture) // 2 * 2:2]
+        values = ["o:{:6}/w:{:4}".format(offset, width) for offset, width in zip(offsets.tolist(), widths.tolist())]
+        lines = [", ".join(values[start:start + 5]) for start in range(0, len(values), 5)]
+        f.write("\nreceived time: {}\n{}\n".format(received_time, ",\n".join(lines)))
+
+def _encode_varints(deltas: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # LEB128 bytes of non negative deltas below 2^28 and the length of each,
+    # from 4 byte lanes masked by length
+    lengths = 1 + (deltas >= 1 << 7) + (deltas >= 1 << 14) + (deltas >= 1 << 21)
+    lanes = np.arange(4)
+    groups = (deltas[:, None] >> (7 * lanes)) & 0x7f
+    groups |= np.where(lanes < lengths[:, None] - 1, 0x80, 0)
+    return groups[lanes < lengths[:, None]].astype(np.uint8), lengths
+
+_RECORD_HEADER_DTYPE = np.dtype([("magic", "S2"), ("version", "u1"), ("protocol", "u1"), ("received", "<u4"), ("nedges", "<u2"), ("payload_len", "<u2")])
+
+def write_records(train: PulseTrain, f: BinaryIO, received_time: int = 1700000000) -> None:
+    # one frame record per capture, all encoded at once
+    starts = train.get_capture_starts()
+    if len(starts) == 0:
+        return
+    deltas = np.maximum(np.diff(train.edges_us), 0)
+    # the delta across a capture break is not stored
+    inside = np.ones(len(deltas), dtype=bool)
+    inside[starts[1:] - 1] = False
+    payload, lengths = _encode_varints(deltas[inside])
+    nedges = np.diff(np.append(starts, len(train.edges_us)))
+    capture_of_delta = np.searchsorted(starts, np.flatnonzero(inside), side="right") - 1
+    payload_len = np.bincount(capture_of_delta, weights=lengths, minlength=len(starts)).astype(np.int64)
+    headers = np.zeros(len(starts), dtype=_RECORD_HEADER_DTYPE)
+    headers["magic"] = IrFrameRecord.MAGIC
+    headers["version"] = IrFrameRecord.VERSION
+    headers["protocol"] = PROTOCOLS[train.protocol][0]
+    headers["received"] = received_time
+    headers["nedges"] = nedges
+    headers["payload_len"] = payload_len
+    # header i starts after the headers and payloads of the captures before it
+    size = IrFrameRecord.HEADER.size
+    header_pos = np.arange(len(starts)) * size + np.concatenate([[0], np.cumsum(payload_len)[:-1]])
+    out = np.empty(len(starts) * size + len(payload), dtype=np.uint8)
+    is_header = np.zeros(len(out), dtype=bool)
+    header_index = (header_pos[:, None] + np.arange(size)).ravel()
+    is_header[header_index] = True
+    out[header_index] = headers.view(np.uint8)
+    out[~is_header] = payload
+    f.write(out.tobytes())
+
+def write_truth(train: PulseTrain, f: TextIO) -> None:
+    for start, repeat, bits in zip(train.start_us.tolist(), train.repeat.tolist(), train.bits):
+        f.write("{},{},{}\n".format(start, int(repeat), "".join("01"[bit] for bit in bits)))
+
+_OPTIONS = {"-n": int, "--repeats": int, "--period": float, "--bytes": int, "--jitter": float, "--glitch": float, "--drop": float, "--seed": int, "--truth": str, "--chunk": int}
+
+def print_usage() -> None:
+    print("usage: python {} PROTOCOL [OPTIONS] OUTPUT.txt|OUTPUT.bin|OUTPUT.npy".format(args[0]))
+    print("       PROTOCOL is one of {}".format(", ".join(PROTOCOLS)))
+    print("       -n FRAMES (1000)   --repeats N (0)     --period MS (protocol repeat period)")
+    print("       --bytes N (6, aeha data bytes)         --seed S")
+    print("       --jitter US (0, sd of every edge)      --glitch RATE (0, per space)   --drop RATE (0, per mark)")
+    print("       --truth FILE.csv (start_us,repeat,bits of every transmission)         --chunk FRAMES (10000)")
+
+if __name__ == "__main__":
+    try:
+        args = sys.argv
+        if len(args) < 3 or args[1] not in PROTOCOLS or len(args) % 2 != 1:
+            print_usage()
+            exit(1)
+        options = {}
+        for index in range(2, len(args) - 1, 2):
+            if args[index] not in _OPTIONS:
+                print_usage()
+                exit(1)
+            options[args[index]] = _OPTIONS[args[index]](args[index + 1])
+        output = args[-1]
+        count = options.get("-n", 1000)
+        chunk = options.get("--chunk", 10000)
+        rng = np.random.default_rng(options.get("--seed"))
+        truth = open(options["--truth"], "w") if "--truth" in options else None
+        edges = []
+        with open(output, "w" if output.endswith(".txt") else "wb") as f:
+            start_us = 0
+            for first in range(0, count, chunk):
+                train = generate(args[1], min(chunk, count - first), rng, options.get("--repeats", 0), options.get("--period"), options.get("--bytes", 6),
+                                 options.get("--jitter", 0.0), options.get("--glitch", 0.0), options.get("--drop", 0.0), start_us)
+                start_us = train.end_us
+                if output.endswith(".txt"):
+                    write_dump(train, f)
+                elif output.endswith(".bin"):
+                    write_records(train, f)
+                else:
+                    edges.append(train.edges_us)
+                if truth is not None:
+                    write_truth(train, truth)
+            if edges:
+                np.save(f, np.concatenate(edges))
+        if truth is not None:
+            truth.close()
+    except KeyboardInterrupt:
+        pass
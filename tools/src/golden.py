@@ -0,0 +1,225 @@
+import os
+import statistics
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from common import IrFrame, IrPulse
+from analyzer import IrSignalAnalyzer
+from batch import list_captures, load_pulses
+from detect import classify_pulses, get_config, get_protocol_name, split_bursts
+
+# golden captures are recorded from the original remote controller
+_GOLDEN_SUFFIX = "-original-remote-controller"
+# gaps are compared up to this many T, longer gaps are all the same
+_MAX_GAP_T = 32
+
+class DecodedFrame:
+    # a decoded frame together with the burst of pulses it was decoded from
+    def __init__(self, path: str, index: int, protocol: int, t_us: int, frame: IrFrame, pulses: list[IrPulse]) -> None:
+        self.path = path
+        self.index = index
+        self.protocol = protocol
+        self.frame = frame
+        self.pulses = pulses
+        self.key = (protocol,) + frame.get_key()
+        self.bits = frame.get_bits()
+        # (mark, gap before the mark) in us, used to align pulses, and the
+        # same rounded to T
+        self.timings = []
+        self.symbols = []
+        before = None
+        for pulse in pulses:
+            gap_us = 0 if before is None else min(pulse.raise_us - before.fall_us, _MAX_GAP_T * t_us)
+            self.timings.append((pulse.duration_us, gap_us))
+            self.symbols.append((round(pulse.duration_us / t_us), round(gap_us / t_us)))
+            before = pulse
+
+    def get_name(self) -> str:
+        return "{}#{}".format(os.path.basename(self.path), self.index)
+
+def decode_frames(path: str) -> list[DecodedFrame]:
+    frames = []
+    for burst in split_bursts(load_pulses(path)):
+        protocol = classify_pulses(burst)
+        config = get_config(protocol)
+        if config is None:
+            continue
+        analyzer = IrSignalAnalyzer(config)
+        for frame in analyzer.stream(burst):
+            frames.append(DecodedFrame(path, len(frames), protocol, config.t_us, frame, burst))
+    return frames
+
+def _bit_distance(golden_bits: str, captured_bits: str) -> int:
+    distance = abs(len(golden_bits) - len(captured_bits))
+    for golden_bit, captured_bit in zip(golden_bits, captured_bits):
+        if golden_bit != captured_bit:
+            distance += 1
+    return distance
+
+class GoldenIndex:
+    # Golden frames are looked up by (protocol, customer code, data header).
+    # Captures whose key was damaged fall back to the closest golden frame
+    # of the same protocol.
+    def __init__(self) -> None:
+        self._by_key = {}
+        self._by_protocol = {}
+
+    def add(self, golden: DecodedFrame) -> None:
+        self._by_key.setdefault(golden.key, []).append(golden)
+        self._by_protocol.setdefault(golden.protocol, []).append(golden)
+
+    def find(self, captured: DecodedFrame) -> DecodedFrame | None:
+        candidates = self._by_key.get(captured.key) or self._by_protocol.get(captured.protocol, [])
+        return min(candidates, key=lambda golden: _bit_distance(golden.bits, captured.bits), default=None)
+
+class FrameDiff:
+    def __init__(self, golden: DecodedFrame, captured: DecodedFrame) -> None:
+        self.golden = golden
+        self.captured = captured
+        self.bit_errors = _bit_distance(golden.bits, captured.bits)
+        self.first_divergent_bit = None
+        self.first_divergent_field = None
+        for index, (golden_bit, captured_bit) in enumerate(zip(golden.bits, captured.bits)):
+            if golden_bit != captured_bit:
+                self.first_divergent_bit = index
+                break
+        if self.first_divergent_bit is None and len(golden.bits) != len(captured.bits):
+            self.first_divergent_bit = min(len(golden.bits), len(captured.bits))
+        if self.first_divergent_bit is not None:
+            self.first_divergent_field = self._find_field(self.first_divergent_bit)
+        self.missing_pulses = 0
+        self.extra_pulses = 0
+        self.mark_deviations_us = []
+        self.gap_deviations_us = []
+        self._align_pulses()
+
+    def _find_field(self, bit: int) -> str:
+        end = 0
+        for name, bits in self.golden.frame.get_fields():
+            end += len(bits)
+            if bit < end:
+                return name
+        return "end of frame"
+
+    def _align_pulses(self) -> None:
+        golden = self.golden.pulses
+        captured = self.captured.pulses
+        self.missing_pulses = max(0, len(golden) - len(captured))
+        self.extra_pulses = max(0, len(captured) - len(golden))
+        # Deviations are timing errors of a mark or gap of the same length in
+        # T. One of a different length is a differing bit, counted above.
+        before = None
+        for golden_index, captured_index in self._pair_pulses():
+            golden_mark_t, golden_gap_t = self.golden.symbols[golden_index]
+            captured_mark_t, captured_gap_t = self.captured.symbols[captured_index]
+            if captured_mark_t == golden_mark_t:
+                self.mark_deviations_us.append(captured[captured_index].duration_us - golden[golden_index].duration_us)
+            # a gap is only comparable when the pulses before it are paired too
+            if golden_index > 0 and before == (golden_index - 1, captured_index - 1) and captured_gap_t == golden_gap_t:
+                golden_gap_us = golden[golden_index].raise_us - golden[golden_index - 1].fall_us
+                captured_gap_us = captured[captured_index].raise_us - captured[captured_index - 1].fall_us
+                self.gap_deviations_us.append(captured_gap_us - golden_gap_us)
+            before = (golden_index, captured_index)
+
+    def _pair_pulses(self) -> list[tuple[int, int]]:
+        # (golden index, captured index) of the pulses taken to be the same.
+        # With equal counts pulses pair by position. Otherwise every pulse of
+        # the shorter train is paired in order and only the count difference
+        # is left over from the longer one, choosing the pairing with the
+        # least timing difference.
+        golden = self.golden.timings
+        captured = self.captured.timings
+        if len(golden) == len(captured):
+            return [(index, index) for index in range(len(golden))]
+        swap = len(golden) < len(captured)
+        longer, shorter = (captured, golden) if swap else (golden, captured)
+        skips = len(longer) - len(shorter)
+        def cost(long_index: int, short_index: int) -> int:
+            (long_mark, long_gap), (short_mark, short_gap) = longer[long_index], shorter[short_index]
+            return abs(long_mark - short_mark) + abs(long_gap - short_gap)
+        # best[i][k]: cost of the first i pulses of the longer train with k
+        # of them left unpaired (and the first i - k of the shorter paired)
+        infinite = float("inf")
+        best = [[infinite] * (skips + 1) for _ in range(len(longer) + 1)]
+        best[0][0] = 0
+        for i in range(1, len(longer) + 1):
+            for k in range(min(i, skips) + 1):
+                pair = best[i - 1][k] + cost(i - 1, i - 1 - k) if i - k <= len(shorter) and i - k > 0 else infinite
+                skip = best[i - 1][k - 1] if k > 0 else infinite
+                best[i][k] = min(pair, skip)
+        pairs = []
+        i, k = len(longer), skips
+        while i > 0:
+            if k > 0 and best[i][k] == best[i - 1][k - 1]:
+                k -= 1
+            else:
+                pairs.append((i - 1 - k, i - 1) if swap else (i - 1, i - 1 - k))
+            i -= 1
+        pairs.reverse()
+        return pairs
+
+    def dump(self) -> None:
+        print("frame {} vs {} ({})".format(self.captured.index, self.golden.get_name(), get_protocol_name(self.captured.protocol)))
+        if self.first_divergent_bit is None:
+            print("  bits: {} identical".format(len(self.captured.bits)))
+        else:
+            print("  bits: {} golden, {} captured, {} differ, first divergent bit {} in {}".format(len(self.golden.bits), len(self.captured.bits), self.bit_errors, self.first_divergent_bit, self.first_divergent_field))
+        print("  pulses: {} golden, {} captured, {} missing, {} extra".format(len(self.golden.pulses), len(self.captured.pulses), self.missing_pulses, self.extra_pulses))
+        self._dump_deviations("mark", self.mark_deviations_us)
+        self._dump_deviations("gap", self.gap_deviations_us)
+
+    def _dump_deviations(self, name: str, deviations_us: list[int]) -> None:
+        if len(deviations_us) == 0:
+            return
+        print("  {} deviation: mean {:+.1f}us sd {:.1f}us max {}us".format(name, statistics.fmean(deviations_us), statistics.pstdev(deviations_us), max(deviations_us, key=abs)))
+
+_golden_index = None
+
+def _load_golden_index(golden_paths: list[str]) -> None:
+    global _golden_index
+    _golden_index = GoldenIndex()
+    for path in golden_paths:
+        for golden in decode_frames(path):
+            _golden_index.add(golden)
+
+def diff_capture(path: str) -> list[FrameDiff]:
+    diffs = []
+    for captured in decode_frames(path):
+        golden = _golden_index.find(captured)
+        if golden is not None:
+            diffs.append(FrameDiff(golden, captured))
+    return diffs
+
+def diff_captures(paths: list[str], jobs: int | None = None) -> list[tuple[str, list[FrameDiff]]]:
+    captures = list_captures(paths)
+    golden_paths = [path for path in captures if os.path.splitext(path)[0].endswith(_GOLDEN_SUFFIX)]
+    captures = [path for path in captures if path not in golden_paths]
+    if len(captures) == 0:
+        return []
+    workers = jobs or os.cpu_count() or 1
+    # every worker decodes the golden set once and keeps the index
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_golden_index, initargs=(golden_paths,)) as executor:
+        return list(zip(captures, executor.map(diff_capture, captures, chunksize=max(1, len(captures) // (workers * 4)))))
+
+def print_usage() -> None:
+    print("usage: python {} [-j JOBS] PATH...".format(args[0]))
+    print("       captures are compared with the *{}.txt captures found in PATH".format(_GOLDEN_SUFFIX))
+
+if __name__ == "__main__":
+    try:
+        args = sys.argv
+        paths = args[1:]
+        jobs = None
+        if len(paths) >= 2 and paths[0] == "-j":
+            jobs = int(paths[1])
+            paths = paths[2:]
+        if len(paths) == 0:
+            print_usage()
+            exit(1)
+        for path, diffs in diff_captures(paths, jobs):
+            print("== {}".format(path))
+            if len(diffs) == 0:
+                print("no golden frame matched")
+            for diff in diffs:
+                diff.dump()
+    except KeyboardInterrupt:
+        pass
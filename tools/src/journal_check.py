@@ -0,0 +1,67 @@
+import shutil
+import sys
+import tempfile
+import simulator  # puts the shim and the firmware on sys.path
+from journal import Journal
+
+# Host check of src/journal.py: records written through add() and poll()
+# come back from replay() in order, across segment rotation, reboots and a
+# block cut short by a power loss.
+
+_SEGMENTS = 3
+_SEGMENT_BLOCKS = 2
+
+def _record(n: int) -> bytes:
+    # a frame record header (payload_len at offset 10) and n payload bytes
+    return b"IR\x01\x00\x00\x00\x00\x00\x00\x00" + bytes([n & 0xff, n >> 8]) + bytes([n & 0xff]) * n
+
+def _write_blocks(journal: Journal, first: int, nblocks: int) -> list[bytes]:
+    # with _FLUSH_MS 0 every poll() writes the block of the record before it
+    records = []
+    for n in range(first, first + nblocks):
+        record = _record(n)
+        journal.add(record)
+        journal.poll()
+        records.append(record)
+    return records
+
+def _replay_all(journal: Journal) -> list[bytes]:
+    records = []
+    while journal.replay(lambda record: records.append(bytes(record)), 4) or journal.unsent():
+        pass
+    return records
+
+def check(name: str, ok: bool) -> bool:
+    print("{}: {}".format(name, "ok" if ok else "FAILED"))
+    return ok
+
+def run(directory: str) -> bool:
+    ok = True
+    Journal._FLUSH_MS = 0
+    journal = Journal(directory, _SEGMENTS, _SEGMENT_BLOCKS)
+    # every segment written, the next block would reuse the oldest one
+    records = _write_blocks(journal, 0, _SEGMENTS * _SEGMENT_BLOCKS)
+    ok = check("segment boundary", _replay_all(journal) == records) and ok
+    records = _write_blocks(journal, 100, _SEGMENT_BLOCKS * 2)
+    ok = check("rotation", _replay_all(journal) == records) and ok
+    journal.close()
+    journal = Journal(directory, _SEGMENTS, _SEGMENT_BLOCKS)
+    ok = check("reboot", journal.unsent() == 0) and ok
+    records = _write_blocks(journal, 200, 1)
+    ok = check("after reboot", _replay_all(journal) == records) and ok
+    journal.close()
+    with open(journal._segment_path(journal._seq - 1), "ab") as f:
+        f.write(bytes(100))  # a block cut short
+    journal = Journal(directory, _SEGMENTS, _SEGMENT_BLOCKS)
+    records = _write_blocks(journal, 300, 1)
+    ok = check("torn block", _replay_all(journal) == records) and ok
+    journal.close()
+    return ok
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    try:
+        ok = run(directory)
+    finally:
+        shutil.rmtree(directory)
+    exit(0 if ok else 1)
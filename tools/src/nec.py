@@ -1,4 +1,4 @@
-from common import IrFrameIntermediatePartElement, IrFramePartElement, IrSignalAnalyzerConfig, LeaderPartElement, IrFrame
+from common import IrFrameIntermediatePartElement, IrFramePartElement, IrSignalAnalyzerConfig, LeaderPartElement, IrFrame, format_bits
 
 class NecLeaderPartElement(LeaderPartElement):
     def __init__(self) -> None:
@@ -25,6 +25,12 @@ class NecIrFrame(IrFrame):
     def dump(self) -> str:
         print("{:016b}/{:08b}/{:08b}".format(self._customer if self._customer is not None else 0, self._first_data if self._first_data is not None else 0, self._second_data if self._second_data is not None else 0))
 
+    def get_fields(self) -> list[tuple[str, str]]:
+        return [("customer", format_bits(self._customer, 16)), ("first_data", format_bits(self._first_data, 8)), ("second_data", format_bits(self._second_data, 8))]
+
+    def get_key(self) -> tuple:
+        return (self._customer, None)
+
 class NecAnalyzerConfig(IrSignalAnalyzerConfig):
     def __init__(self) -> None:
         super().__init__(562, [NecLeaderPartElement(), NecCustomerPartElement(), NecFirstDataPartElement(), NecSecondDataPartElement()], lambda e: NecIrFrame(e))
@@ -0,0 +1,109 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import numpy as np
+import generator
+from simulator import replay_captures
+
+# Generated frames must come back from the firmware decoders. Every protocol
+# of generator.py is written as a dump, replayed through simulator.py with -v
+# and the printed results are compared with what was sent, line by line.
+
+# generator protocol: the decoders that must decode it
+_DECODERS = {
+    "nec": ("nec_16", "nec_pdm", "multi"),
+    "aeha": ("aeha", "multi"),
+    "sony12": ("sony_12",),
+    "sony15": ("sony_15",),
+    "sony20": ("sony_20", "multi"),
+    "rc5": ("rc5", "multi"),
+    "rc6": ("rc6", "multi"),
+    "mce": ("mce", "multi"),
+}
+
+def _value(bits: np.ndarray, lsb_first: bool = True) -> int:
+    value = 0
+    for index, bit in enumerate(bits.tolist()):
+        value = value | bit << index if lsb_first else value << 1 | bit
+    return value
+
+def _expect(protocol: str, decoder: str, bits: np.ndarray, repeat: bool) -> str:
+    # the line simulator.py -v prints for one transmission. Only NEC sends
+    # repeat codes, the others send the whole frame again.
+    if repeat and protocol == "nec":
+        return "repeat"
+    if protocol == "aeha" or decoder == "nec_pdm":
+        widths = (16, 4, 4) if protocol == "aeha" else (16, 8, 8)
+        fields = []
+        pos = 0
+        for width in widths:
+            fields.append(_value(bits[pos:pos + width], False))
+            pos += width
+        data = bytes(_value(bits[start:start + 8], False) for start in range(pos, len(bits), 8))
+        return "Fields {} Data {}".format(" ".join("{:x}".format(field) for field in fields), data.hex())
+    if protocol == "nec":
+        data, addr, ctrl = _value(bits[16:24]), _value(bits[:8]), 0
+    elif protocol.startswith("sony"):
+        data, addr, ctrl = _value(bits[:7]), _value(bits[7:]), 0
+        if protocol == "sony20":
+            addr, ctrl = _value(bits[7:12]), _value(bits[12:])
+    elif protocol == "rc5":
+        # MSB first: two start bits (the second is the inverted command bit 6), toggle, address, command
+        value = _value(bits, False)
+        data, addr, ctrl = (value & 0x3f) | (0 if (value >> 12) & 1 else 0x40), (value >> 6) & 0x1f, (value >> 11) & 1
+    elif protocol == "rc6":
+        value = _value(bits, False)
+        data, addr, ctrl = value & 0xff, (value >> 8) & 0xff, (value >> 16) & 1
+    else:
+        value = _value(bits)
+        data, addr, ctrl = (value >> 6) & 0x3f, value & 0xf, (value >> 4) & 3
+    return "Data {:02x} Addr {:04x} Ctrl {:02x}".format(data, addr, ctrl)
+
+def check(protocol: str, count: int, repeats: int, seed: int) -> bool:
+    train = generator.generate(protocol, count, np.random.default_rng(seed), repeats)
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    try:
+        with os.fdopen(fd, "w") as f:
+            generator.write_dump(train, f)
+        ok = True
+        for decoder in _DECODERS[protocol]:
+            expected = [_expect(protocol, decoder, bits, repeat) for bits, repeat in zip(train.bits, train.repeat.tolist())]
+            text = io.StringIO()
+            with contextlib.redirect_stdout(text):
+                replay_captures(decoder, [path], verbose=True)
+            lines = text.getvalue().splitlines()
+            matched = sum(line == want for line, want in zip(lines, expected))
+            print("{} {}: {} of {} transmissions, {} results{}".format(protocol, decoder, matched, len(expected), len(lines),
+                                                                    "" if lines == expected else ", FAILED"))
+            ok = ok and lines == expected
+        return ok
+    finally:
+        os.remove(path)
+
+def print_usage() -> None:
+    print("usage: python {} [PROTOCOL...] [-n COUNT] [--repeats N] [--seed N]".format(args[0]))
+    print("       PROTOCOL is one of {} (default all)".format(", ".join(_DECODERS)))
+    print("       generates COUNT (100) key presses of N (1) repeats each, replays them through the")
+    print("       firmware decoders and exits with 1 if any transmission is not decoded as sent")
+
+if __name__ == "__main__":
+    args = sys.argv
+    options = args[1:]
+    if "-h" in options:
+        print_usage()
+        exit(0)
+    count = int(options[options.index("-n") + 1]) if "-n" in options else 100
+    repeats = int(options[options.index("--repeats") + 1]) if "--repeats" in options else 1
+    seed = int(options[options.index("--seed") + 1]) if "--seed" in options else 1
+    protocols = [option for index, option in enumerate(options) if not option.startswith("-") and (index == 0 or options[index - 1] not in ("-n", "--repeats", "--seed"))]
+    for protocol in protocols:
+        if protocol not in _DECODERS:
+            print_usage()
+            exit(1)
+    ok = True
+    for protocol in protocols or _DECODERS:
+        ok = check(protocol, count, repeats, seed) and ok
+    print("ok" if ok else "mismatch")
+    exit(0 if ok else 1)
@@ -0,0 +1,75 @@
+# CPython stand-in for the parts of the MicroPython machine module used by
+# lib/ir_rx and src, used by simulator.py. Pin levels are driven by the
+# simulator, Timer callbacks run on the virtual clock of the utime shim.
+import utime
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode: int = -1, pull: int = -1, value: int = 1) -> None:
+        self.id = id
+        self._value = value
+        self._handler = None
+        self._trigger = 0
+        # shim only: callables that see every level change, like a PIO input
+        self.listeners = []
+
+    def irq(self, handler=None, trigger: int = IRQ_FALLING | IRQ_RISING) -> None:
+        self._handler = handler
+        self._trigger = trigger
+
+    def value(self, value: int | None = None) -> int | None:
+        if value is None:
+            return self._value
+        self.drive(value)
+
+    def drive(self, value: int) -> None:
+        # sets the level like the receiver output and runs the IRQ handler
+        value = 1 if value else 0
+        if value == self._value:
+            return
+        self._value = value
+        for listener in self.listeners:
+            listener(self)
+        if self._handler is not None and self._trigger & (Pin.IRQ_RISING if value else Pin.IRQ_FALLING):
+            self._handler(self)
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id: int = -1, **kwargs) -> None:
+        self.id = id
+        self.deadline_us = 0
+        self._period_us = 0
+        self._mode = Timer.ONE_SHOT
+        self._callback = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode: int = PERIODIC, period: int = -1, callback=None, freq: float = -1) -> None:
+        self._mode = mode
+        self._period_us = int(period * 1000) if freq <= 0 else int(1000000 / freq)
+        self._callback = callback
+        self.deadline_us = utime.now_us() + self._period_us
+        utime.schedule(self)
+
+    def deinit(self) -> None:
+        utime.cancel(self)
+
+    def fire(self) -> None:
+        if self._mode == Timer.PERIODIC:
+            self.deadline_us += max(1, self._period_us)
+        else:
+            utime.cancel(self)
+        if self._callback is not None:
+            self._callback(self)
+
+def freq(hz: int | None = None) -> int | None:
+    if hz is None:
+        return 125000000
@@ -0,0 +1,169 @@
+# CPython stand-in for the MicroPython rp2 module, used by simulator.py with
+# lib/ir_rx/pio.py. asm_pio really assembles the program (so a bad
+# instruction or a missing label fails on the host too), but StateMachine
+# does not interpret it: it models the edge capture program of ir_rx.pio.
+# After put(t) it pushes t plus the microseconds since then on every level
+# change of jmp_pin, starting at the first fall after a high level, when it
+# raises its IRQ.
+# DMA moves the pushed words into a buffer like a DREQ paced channel.
+import types
+import utime
+
+_MAX_INSTRUCTIONS = 32
+_FIFO_DEPTH = 4
+_PIO_RXF = (0x50200020, 0x50300020)
+
+class _Instruction:
+    def __init__(self, name: str, args: tuple) -> None:
+        self.name = name
+        self.args = args
+        self.delay = 0
+
+    def __getitem__(self, delay: int) -> "_Instruction":
+        if not 0 <= delay <= 31:
+            raise ValueError("delay out of range")
+        self.delay = delay
+        return self
+
+    def side(self, value: int) -> "_Instruction":
+        return self
+
+class Program:
+    def __init__(self, instructions: list[_Instruction], labels: dict[str, int]) -> None:
+        self.instructions = instructions
+        self.labels = labels
+
+def asm_pio(**kwargs):
+    def assemble(function) -> Program:
+        instructions = []
+        labels = {}
+        def instruction(name: str):
+            def emit(*args) -> _Instruction:
+                emitted = _Instruction(name, args)
+                instructions.append(emitted)
+                return emitted
+            return emit
+        def label(name: str) -> None:
+            labels[name] = len(instructions)
+        names = {name: instruction(name) for name in ("jmp", "wait", "in_", "out", "push", "pull", "mov", "irq", "set", "nop")}
+        names.update({name: name for name in ("x", "y", "x_dec", "y_dec", "not_x", "not_y", "x_not_y", "not_osre", "pin", "pins", "isr", "osr", "null", "pc", "exec", "status", "gpio", "block", "noblock", "iffull", "ifempty", "clear")})
+        names.update(label=label, wrap_target=lambda: None, wrap=lambda: None,
+                     invert=lambda source: ("invert", source), reverse=lambda source: ("reverse", source), rel=lambda index: ("rel", index))
+        types.FunctionType(function.__code__, {**function.__globals__, **names})()
+        if len(instructions) > _MAX_INSTRUCTIONS:
+            raise ValueError("program has {} instructions, PIO memory holds {}".format(len(instructions), _MAX_INSTRUCTIONS))
+        for emitted in instructions:
+            if emitted.name == "jmp" and emitted.args[-1] not in labels:
+                raise ValueError("unknown label {}".format(emitted.args[-1]))
+        return Program(instructions, labels)
+    return assemble
+
+# state machines by id, so DMA can find the one behind a FIFO address
+_machines = {}
+
+class StateMachine:
+    def __init__(self, id: int, program: Program, freq: int = -1, jmp_pin=None, **kwargs) -> None:
+        self.id = id
+        self.program = program
+        self._jmp_pin = jmp_pin
+        self._active = False
+        self._t0 = None
+        self._put_us = 0
+        self._first = True
+        self._high = False
+        self._fifo = []
+        self._handler = None
+        self.dma = None
+        _machines[id] = self
+        if jmp_pin is not None:
+            jmp_pin.listeners.append(self._on_level)
+
+    def active(self, value: int | None = None) -> bool | None:
+        if value is None:
+            return self._active
+        self._active = bool(value)
+
+    def restart(self) -> None:
+        self._t0 = None
+        self._first = True
+
+    def put(self, value: int) -> None:
+        self._t0 = value & 0xffffffff
+        self._put_us = utime.now_us()
+        self._high = self._jmp_pin.value() == 1
+
+    def get(self) -> int:
+        return self._fifo.pop(0)
+
+    def rx_fifo(self) -> int:
+        return len(self._fifo)
+
+    def irq(self, handler=None, trigger: int = 0, hard: bool = False) -> None:
+        self._handler = handler
+
+    def _on_level(self, pin) -> None:
+        if not self._active or self._t0 is None:
+            return
+        if self._first:
+            # a mark that was already on at put() is not the first edge
+            if pin.value() != 0 or not self._high:
+                self._high = pin.value() == 1
+                return
+            self._first = False
+            self._push()
+            if self._handler is not None:
+                self._handler(self)
+        else:
+            self._push()
+
+    def _push(self) -> None:
+        value = (self._t0 + utime.now_us() - self._put_us) & 0xffffffff
+        if self.dma is not None and self.dma.take(value):
+            return
+        if len(self._fifo) < _FIFO_DEPTH:
+            self._fifo.append(value)
+
+class DMA:
+    def __init__(self) -> None:
+        self._buffer = None
+        self._index = 0
+        self.count = 0
+        self._active = False
+        self._machine = None
+
+    def pack_ctrl(self, default: int | None = None, **kwargs) -> dict:
+        return kwargs
+
+    def config(self, read=None, write=None, count: int = 0, ctrl: dict | None = None, trigger: bool = False) -> None:
+        base = _PIO_RXF[1] if read >= _PIO_RXF[1] else _PIO_RXF[0]
+        machine = _machines[(base == _PIO_RXF[1]) * 4 + (read - base) // 4]
+        if machine.dma is not None and machine.dma is not self:
+            raise ValueError("FIFO already read by another channel")
+        machine.dma = self
+        self._machine = machine
+        self._buffer = write
+        self._index = 0
+        self.count = count
+        self._active = trigger
+        while self._active and self.count > 0 and machine.rx_fifo():
+            self.take(machine.get())
+
+    def active(self, value: int | None = None) -> bool | None:
+        if value is None:
+            return self._active and self.count > 0
+        self._active = bool(value)
+
+    def take(self, value: int) -> bool:
+        # one DREQ: stores a pushed word if the channel still has transfers
+        if not self._active or self.count == 0:
+            return False
+        self._buffer[self._index] = value - (1 << 32) if value & 0x80000000 else value
+        self._index += 1
+        self.count -= 1
+        return True
+
+    def close(self) -> None:
+        self._active = False
+        if self._machine is not None and self._machine.dma is self:
+            self._machine.dma = None
+        self._machine = None
@@ -0,0 +1,78 @@
+# CPython stand-in for the MicroPython utime module, used by simulator.py.
+# Time only moves when the simulator advances the virtual clock, and pending
+# machine.Timer callbacks fire at their exact deadlines on the way. Ticks wrap
+# at 2^30 like on the RP2040, so ticks_diff mistakes show up on the host too.
+import time as _time
+
+TICKS_PERIOD = 1 << 30
+_TICKS_MAX = TICKS_PERIOD - 1
+_TICKS_HALF = TICKS_PERIOD // 2
+# Unix time at virtual time 0
+EPOCH = 1700000000
+
+_now_us = 0
+# machine.Timer objects with a pending deadline
+_timers = []
+
+def reset(start_us: int = 0) -> None:
+    global _now_us
+    _now_us = start_us
+    _timers.clear()
+
+def now_us() -> int:
+    return _now_us
+
+def schedule(timer) -> None:
+    if timer not in _timers:
+        _timers.append(timer)
+
+def cancel(timer) -> None:
+    if timer in _timers:
+        _timers.remove(timer)
+
+def advance_to(t_us: int) -> None:
+    # fires every timer due up to t_us in deadline order, then moves to t_us
+    global _now_us
+    while _timers:
+        timer = min(_timers, key=lambda timer: timer.deadline_us)
+        if timer.deadline_us > t_us:
+            break
+        _now_us = max(_now_us, timer.deadline_us)
+        timer.fire()
+    _now_us = max(_now_us, t_us)
+
+def advance(us: int) -> None:
+    advance_to(_now_us + us)
+
+def run_timers() -> None:
+    # lets every pending (non periodic) timer fire
+    while _timers:
+        advance_to(min(timer.deadline_us for timer in _timers))
+
+def ticks_us() -> int:
+    return _now_us & _TICKS_MAX
+
+def ticks_ms() -> int:
+    return (_now_us // 1000) & _TICKS_MAX
+
+def ticks_diff(ticks1: int, ticks2: int) -> int:
+    return ((ticks1 - ticks2 + _TICKS_HALF) & _TICKS_MAX) - _TICKS_HALF
+
+def ticks_add(ticks: int, delta: int) -> int:
+    return (ticks + delta) & _TICKS_MAX
+
+def sleep_us(us: int) -> None:
+    advance(us)
+
+def sleep_ms(ms: int) -> None:
+    advance(ms * 1000)
+
+def sleep(seconds: float) -> None:
+    advance(int(seconds * 1000000))
+
+def time() -> int:
+    return EPOCH + _now_us // 1000000
+
+def localtime(seconds: int | None = None) -> tuple:
+    t = _time.gmtime(time() if seconds is None else seconds)
+    return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, t.tm_wday, t.tm_yday)
@@ -0,0 +1,268 @@
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from typing import Callable
+from common import LIB_DIR, IrPulse
+from batch import list_captures, load_pulses
+import ir_detect
+import ir_pdm
+
+# shim/ holds CPython versions of machine and utime, src/ the firmware
+SHIM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shim")
+SRC_DIR = os.path.normpath(os.path.join(LIB_DIR, "..", "src"))
+if SHIM_DIR not in sys.path:
+    sys.path.insert(0, SHIM_DIR)
+if SRC_DIR not in sys.path:
+    sys.path.append(SRC_DIR)
+
+import machine
+import utime
+from ir_rx import IR_RX
+from ir_rx.nec import NEC_8, NEC_16
+from ir_rx.sony import SONY_12, SONY_15, SONY_20
+from ir_rx.philips import RC5_IR, RC6_M0
+from ir_rx.mce import MCE
+from ir_rx.pdm import AEHA, NEC_PDM
+from ir_rx.multi import IR_MULTI
+from ir_rx.pio import PIO_CAPTURE
+from dump import IR_DUMP
+
+DECODERS = {
+    "nec_8": NEC_8,
+    "nec_16": NEC_16,
+    "sony_12": SONY_12,
+    "sony_15": SONY_15,
+    "sony_20": SONY_20,
+    "rc5": RC5_IR,
+    "rc6": RC6_M0,
+    "mce": MCE,
+    "aeha": AEHA,
+    "nec_pdm": NEC_PDM,
+    "multi": IR_MULTI,
+    "dump": IR_DUMP,
+}
+
+# the decoders the multi decoder dispatches to, one per protocol
+MULTI_DECODERS = (NEC_16, SONY_20, RC5_IR, RC6_M0, MCE, AEHA)
+
+ERROR_NAMES = {
+    IR_RX.REPEAT: "repeat",
+    IR_RX.BADSTART: "bad start",
+    IR_RX.BADBLOCK: "bad block",
+    IR_RX.BADREP: "bad repeat",
+    IR_RX.OVERRUN: "overrun",
+    IR_RX.BADDATA: "bad data",
+    IR_RX.BADADDR: "bad address",
+}
+
+# gap before every dump block (which restart their offsets) and every
+# capture. Longer than the block window of any decoder (AEHA's 500 ms tblock,
+# IR_DUMP._FRAME_MS), so each block is decoded on its own.
+_BLOCK_GAP_US = (IR_DUMP._FRAME_MS + 100) * 1000
+# --speed never shortens a gap below this: a shorter gap would join two
+# bursts, or two frames of one AEHA transmission, that the decoders split
+_MIN_GAP_US = max(ir_detect.BURST_GAP, ir_pdm.AEHA[5])
+
+def pulses_to_edges(pulses: list[IrPulse], speed: float = 1.0) -> list[int]:
+    # Edge times from 0. Gaps between bursts are divided by speed, down to
+    # _MIN_GAP_US, the pulses themselves keep their timing, so a higher speed
+    # is a faster repeat rate.
+    edges = []
+    base_us = 0
+    before = None
+    for pulse in pulses:
+        if before is not None:
+            gap_us = pulse.raise_us - before.fall_us
+            if gap_us < 0:
+                base_us = edges[-1] + _BLOCK_GAP_US - pulse.raise_us
+                gap_us = _BLOCK_GAP_US
+            if gap_us > _MIN_GAP_US:
+                base_us -= gap_us - max(int(gap_us / speed), _MIN_GAP_US)
+        edges.append(base_us + pulse.raise_us)
+        if pulse.duration_us >= 0:
+            edges.append(base_us + pulse.fall_us)
+        before = pulse
+    return edges
+
+class Simulator:
+    # A receiver pin on the virtual clock. Edges are replayed into the pin
+    # IRQ of the receivers attached to it, and their timers fire at exact
+    # virtual times, so a replay is deterministic and runs as fast as the host.
+    # With trace_allocations the peak memory allocated by each decode is
+    # recorded too (tracemalloc slows the decode, so time it separately).
+    # With pio the receivers capture through ir_rx.pio on the rp2 shim
+    # instead of the pin IRQ, with compact into the 16 bit edge store.
+    def __init__(self, start_us: int = 0, trace_allocations: bool = False, pio: bool = False, compact: bool = False) -> None:
+        utime.reset(start_us)
+        self.pin = machine.Pin(0, machine.Pin.IN)
+        self.pio = pio
+        IR_RX.compact = compact
+        self.trace_allocations = trace_allocations
+        self.decode_ns = []
+        self.decode_alloc_bytes = []
+        # main loop work, run after every edge like the scanner's tasks
+        self.tasks = []
+
+    def attach(self, decoder_class: type, callback: Callable, *args) -> IR_RX:
+        return self.attach_receiver(decoder_class(self.get_input(), callback, *args))
+
+    def get_input(self):
+        # what a receiver is constructed with: the pin or a capture backend on it
+        return PIO_CAPTURE(self.pin) if self.pio else self.pin
+
+    def attach_receiver(self, receiver: IR_RX) -> IR_RX:
+        # time every timer callback (the decode) in host time
+        decode = receiver.cb
+        def timed_decode(timer) -> None:
+            if self.trace_allocations:
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+            start = time.perf_counter_ns()
+            decode(timer)
+            self.decode_ns.append(time.perf_counter_ns() - start)
+            if self.trace_allocations:
+                _, peak = tracemalloc.get_traced_memory()
+                self.decode_alloc_bytes.append(peak - before)
+        receiver.cb = timed_decode
+        return receiver
+
+    def replay(self, edges_us: list[int]) -> None:
+        # the receiver output is active low: a mark starts with a falling edge
+        if self.pin.value() == 0:
+            # the last capture ended in a mark (w: -1). release the pin and let
+            # the block it starts on an IRQ receiver end before the next capture.
+            self.pin.drive(1)
+            utime.run_timers()
+            self._run_tasks()
+        start_us = utime.now_us() + _BLOCK_GAP_US
+        for index, edge_us in enumerate(edges_us):
+            utime.advance_to(start_us + edge_us)
+            self.pin.drive(index & 1)
+            self._run_tasks()
+        utime.run_timers()
+        self._run_tasks()
+
+    def _run_tasks(self) -> None:
+        for task in self.tasks:
+            task()
+
+class ReplayReport:
+    def __init__(self) -> None:
+        self.frames = 0
+        self.results = Counter()
+        self.edges = 0
+        self.duration_us = 0
+        self.decode_ns = []
+        self.decode_alloc_bytes = []
+
+    def on_result(self, code: int) -> None:
+        if code >= 0:
+            self.frames += 1
+        else:
+            self.results[ERROR_NAMES.get(code, str(code))] += 1
+
+    def get_edge_rate(self) -> float:
+        return self.edges * 1000000 / self.duration_us if self.duration_us > 0 else 0.0
+
+    def dump(self, name: str, speed: float) -> None:
+        results = ", ".join("{} {}".format(kind, count) for kind, count in sorted(self.results.items()))
+        decode = ""
+        if self.decode_ns:
+            decode = ", decode mean {:.1f}us max {:.1f}us".format(sum(self.decode_ns) / len(self.decode_ns) / 1000, max(self.decode_ns) / 1000)
+        print("{} x{:g}: {} edges at {:.0f} edges/s, {} frames{}{}".format(name, speed, self.edges, self.get_edge_rate(), self.frames, ", " + results if results else "", decode))
+
+def replay_captures(name: str, paths: list[str], speed: float = 1.0, verbose: bool = False, trace_allocations: bool = False, pio: bool = False, compact: bool = False, min_pulse_us: int = 0, min_leader_us: int = 0, stats: bool = False) -> ReplayReport:
+    report = ReplayReport()
+    simulator = Simulator(trace_allocations=trace_allocations, pio=pio, compact=compact)
+    def on_frame(data, addr, ctrl) -> None:
+        report.on_result(data)
+        if verbose:
+            print("Data {:02x} Addr {:04x} Ctrl {:02x}".format(data, addr, ctrl) if data >= 0 else ERROR_NAMES.get(data, data))
+    def on_pdm_frame(fields, data, nbits) -> None:
+        report.on_result(0 if nbits >= 0 else nbits)
+        if verbose:
+            print("Fields {} Data {}".format(" ".join("{:x}".format(field) for field in fields), data[:(nbits + 7) // 8].hex()) if nbits >= 0 else "repeat")
+    decoder_class = DECODERS[name]
+    if decoder_class is IR_MULTI:
+        receiver = simulator.attach_receiver(IR_MULTI(simulator.get_input()))
+        for cls in MULTI_DECODERS:
+            receiver.add(cls, on_pdm_frame if cls is AEHA else on_frame)
+    else:
+        receiver = simulator.attach(decoder_class, on_pdm_frame if decoder_class in (AEHA, NEC_PDM) else on_frame)
+    receiver.error_function(report.on_result)
+    if min_pulse_us or min_leader_us:
+        receiver.set_filter(min_pulse_us, min_leader_us)
+    if decoder_class is IR_DUMP:
+        simulator.tasks.append(_DumpDrain(receiver, report, verbose).run)
+    for path in list_captures(paths):
+        edges = pulses_to_edges(load_pulses(path), speed)
+        simulator.replay(edges)
+        report.edges += len(edges)
+        report.duration_us += edges[-1] - edges[0] if edges else 0
+    report.decode_ns = simulator.decode_ns
+    if stats:
+        print("stats: {}".format(receiver.stats()))
+    report.decode_alloc_bytes = simulator.decode_alloc_bytes
+    return report
+
+class _DumpDrain:
+    # the scanner's output task: drains the IR_DUMP ring outside the decode
+    def __init__(self, dump: IR_DUMP, report: ReplayReport, verbose: bool) -> None:
+        self._dump = dump
+        self._report = report
+        self._verbose = verbose
+
+    def run(self) -> None:
+        if self._dump.pending() == 0:
+            return
+        self._report.frames += self._dump.pending()
+        if self._verbose:
+            # IR_DUMP writes whole frames to sys.stdout.buffer, after any text still buffered
+            sys.stdout.flush()
+            self._dump.drain()
+        else:
+            with contextlib.redirect_stdout(io.TextIOWrapper(io.BytesIO())):
+                self._dump.drain()
+
+def print_usage() -> None:
+    print("usage: python {} DECODER [-v] [--pio | --compact] [--min-pulse US] [--min-leader US] [--stats] [--speed N | --sweep] PATH...".format(args[0]))
+    print("       DECODER is one of {}".format(", ".join(DECODERS)))
+    print("       -v prints every result (the dump decoder prints the o:/w: dump)")
+    print("       --pio captures the edges with the rp2 PIO backend (ir_rx.pio) instead of the pin IRQ")
+    print("       --compact captures into the 16 bit delta edge store (IR_RX.compact)")
+    print("       --min-pulse and --min-leader set the glitch filter of the pin IRQ (IR_RX.set_filter)")
+    print("       --stats prints the receiver's IR_RX.stats() after the replay")
+    print("       --speed divides the gaps between bursts by N (not below {} us), --sweep doubles N up".format(_MIN_GAP_US))
+    print("       to 64 and stops once frames overrun or fewer frames than at x1 are decoded")
+
+if __name__ == "__main__":
+    try:
+        args = sys.argv
+        options = args[2:]
+        if len(args) < 3 or args[1] not in DECODERS:
+            print_usage()
+            exit(1)
+        verbose = "-v" in options
+        speeds = [1.0]
+        if "--sweep" in options:
+            speeds = [float(1 << n) for n in range(7)]
+        if "--speed" in options:
+            speeds = [float(options[options.index("--speed") + 1])]
+        min_pulse_us = int(options[options.index("--min-pulse") + 1]) if "--min-pulse" in options else 0
+        min_leader_us = int(options[options.index("--min-leader") + 1]) if "--min-leader" in options else 0
+        paths = [option for index, option in enumerate(options) if not option.startswith("-") and (index == 0 or options[index - 1] not in ("--speed", "--min-pulse", "--min-leader"))]
+        x1_frames = None
+        for speed in speeds:
+            report = replay_captures(args[1], paths, speed, verbose, pio="--pio" in options, compact="--compact" in options, min_pulse_us=min_pulse_us, min_leader_us=min_leader_us, stats="--stats" in options)
+            report.dump(args[1], speed)
+            if x1_frames is None:
+                x1_frames = report.frames
+            # the receiver falls behind: frames are lost or merged, with or without an overrun
+            if "--sweep" in options and (report.results["overrun"] > 0 or report.frames < x1_frames):
+                break
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,53 @@
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from common import TimingStatistics
+from batch import list_captures, load_pulses
+from detect import stream_mixed
+
+def measure_capture(path: str) -> dict[str, TimingStatistics]:
+    # protocol name -> statistics of all frames of that protocol
+    timings = {}
+    for _ in stream_mixed(load_pulses(path), timings=timings):
+        pass
+    return timings
+
+def measure_captures(paths: list[str], jobs: int | None = None) -> dict:
+    captures = list_captures(paths)
+    report = {"files": {}, "sets": {}}
+    if len(captures) == 0:
+        return report
+    workers = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(measure_capture, captures, chunksize=max(1, len(captures) // (workers * 4)))
+        # a set is the directory the captures were recorded into
+        sets = {}
+        for path, timings in zip(captures, results):
+            report["files"][path] = {name: statistics.to_dict() for name, statistics in sorted(timings.items())}
+            set_timings = sets.setdefault(os.path.dirname(path), {})
+            for name, statistics in timings.items():
+                set_timings.setdefault(name, TimingStatistics()).merge(statistics)
+    for set_path, timings in sets.items():
+        report["sets"][set_path] = {name: statistics.to_dict() for name, statistics in sorted(timings.items())}
+    return report
+
+def print_usage() -> None:
+    print("usage: python {} [-j JOBS] PATH... > timing.json".format(args[0]))
+    print("       PATH is a capture (.txt dump or .bin records) or a directory of captures")
+
+if __name__ == "__main__":
+    try:
+        args = sys.argv
+        paths = args[1:]
+        jobs = None
+        if len(paths) >= 2 and paths[0] == "-j":
+            jobs = int(paths[1])
+            paths = paths[2:]
+        if len(paths) == 0:
+            print_usage()
+            exit(1)
+        json.dump(measure_captures(paths, jobs), sys.stdout, indent=1)
+        print()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,141 @@
+import re
+from typing import BinaryIO
+import numpy as np
+from common import IrFrame, IrFrameIntermediatePartElement, IrFrameRawPartElement, IrSignalAnalyzerConfig, IrTimeWindow, LeaderPartElement, read_frame_records
+from aeha import AehaDataPartElement
+from analyzer import IrSignalAnalyzer
+
+_PULSE_VALUE_PATTERN = re.compile(r"[ow]:\s*(-?\d+)")
+
+class VectorizedIrSignalAnalyzer:
+    # Decodes a whole capture at once. Every pulse is classified with array
+    # masks and the per-frame loop only jumps between leader and trailer
+    # positions, so the cost per edge stays in numpy. The decoded frames are
+    # the same as IrSignalAnalyzer's, but no per-gap warnings are printed.
+    def __init__(self, config: IrSignalAnalyzerConfig) -> None:
+        self._t_us = config.t_us
+        self._config = config
+        self._frame_builder = config.frame_builder
+        self._leader = None
+        self._part_lens = []
+        self._has_data = False
+        for element in config.elements:
+            element.accept(self)
+        self._frames = []
+        self._raise_us = []
+        self._duration_us = []
+
+    def visitLeader(self, element: LeaderPartElement) -> None:
+        self._leader = element
+
+    def visitIntermediate(self, element: IrFrameIntermediatePartElement) -> None:
+        self._part_lens.append(element.get_data_len())
+
+    def visitData(self, element: AehaDataPartElement) -> None:
+        self._has_data = True
+
+    def load_text(self, text: str) -> None:
+        # o:/w: values alternate, so the flat value list reshapes into pairs
+        values = np.fromstring(" ".join(_PULSE_VALUE_PATTERN.findall(text)), dtype=np.int64, sep=" ")
+        pairs = values[:len(values) // 2 * 2].reshape(-1, 2)
+        self._raise_us.append(pairs[:, 0])
+        self._duration_us.append(pairs[:, 1])
+
+    def load_records(self, stream: BinaryIO) -> None:
+        for record in read_frame_records(stream):
+            edges = np.array(record.edges, dtype=np.int64)
+            raise_us = edges[0::2]
+            duration_us = np.full(len(raise_us), -1, dtype=np.int64)
+            fall_us = edges[1::2]
+            duration_us[:len(fall_us)] = fall_us - raise_us[:len(fall_us)]
+            self._raise_us.append(raise_us)
+            self._duration_us.append(duration_us)
+
+    def analyze(self) -> None:
+        raise_us = np.concatenate(self._raise_us) if self._raise_us else np.empty(0, dtype=np.int64)
+        duration_us = np.concatenate(self._duration_us) if self._duration_us else np.empty(0, dtype=np.int64)
+        self._raise_us = []
+        self._duration_us = []
+        pulse_count = len(raise_us)
+        if pulse_count == 0:
+            return
+
+        gap_us = np.zeros(pulse_count, dtype=np.int64)
+        gap_us[1:] = raise_us[1:] - (raise_us[:-1] + duration_us[:-1])
+        is_leader = self._is_in_window(duration_us, self._config.leader_high)
+        is_frame_low = self._is_in_window(gap_us, self._config.frame_low)
+        is_repeat_low = self._is_in_window(gap_us, self._config.repeat_low)
+        bits = (~self._is_in_window(gap_us, self._config.bit0_gap)).astype(np.uint8)
+        leader_pos = np.flatnonzero(is_leader)
+        trailer_pos = np.flatnonzero((gap_us >= IrSignalAnalyzer._FRAME_END_GAP_US) | (gap_us < 0))
+
+        parts_len = sum(self._part_lens)
+        cursor = 0
+        is_leader_found = False
+        while cursor < pulse_count:
+            if not is_leader_found:
+                index = np.searchsorted(leader_pos, cursor)
+                if index == len(leader_pos):
+                    break
+                cursor = int(leader_pos[index]) + 1
+                is_leader_found = True
+                continue
+            # cursor points at the first pulse after the leader mark
+            if not is_frame_low[cursor] and is_repeat_low[cursor]:
+                # repeat code
+                is_leader_found = False
+                cursor += 1
+                continue
+            parts_start = cursor + 1
+            parts_end = parts_start + parts_len
+            if parts_end > pulse_count:
+                # the capture ended inside the fixed length parts
+                if pulse_count - parts_start >= self._part_lens[0]:
+                    self._append_frame(bits[parts_start:], None)
+                break
+            if not self._has_data:
+                self._append_frame(bits[parts_start:parts_end], None)
+                is_leader_found = bool(is_leader[parts_end - 1])
+                cursor = parts_end
+                continue
+            index = np.searchsorted(trailer_pos, parts_end)
+            trailer = int(trailer_pos[index]) if index < len(trailer_pos) else pulse_count
+            self._append_frame(bits[parts_start:parts_end], bits[parts_end:trailer])
+            if trailer == pulse_count:
+                break
+            is_leader_found = bool(is_leader[trailer])
+            cursor = trailer + 1
+
+    def dump(self) -> None:
+        for frame in self._frames:
+            frame.dump()
+
+    def get_frames(self) -> list[IrFrame]:
+        return self._frames
+
+    def _is_in_window(self, measured_us: np.ndarray, window: IrTimeWindow) -> np.ndarray:
+        return (measured_us >= window.warning_lo_us) & (measured_us <= window.warning_hi_us)
+
+    def _append_frame(self, part_bits: np.ndarray, data_bits: np.ndarray | None) -> None:
+        elements = [self._leader]
+        offset = 0
+        for part_len in self._part_lens:
+            chunk = part_bits[offset:offset + part_len]
+            offset += part_len
+            elements.append(IrFrameRawPartElement(self._pack_int(chunk) if len(chunk) > 0 else None))
+        if self._has_data:
+            elements.append(IrFrameRawPartElement(self._pack_bytes(data_bits) if data_bits is not None else []))
+        self._frames.append(self._frame_builder(elements))
+
+    def _pack_int(self, bits: np.ndarray) -> int:
+        value = 0
+        for byte in np.packbits(bits).tolist():
+            value = (value << 8) | byte
+        # packbits pads the last byte with zeros on the right
+        return value >> (-len(bits) % 8)
+
+    def _pack_bytes(self, bits: np.ndarray) -> list[int]:
+        data = np.packbits(bits).tolist()
+        if len(bits) % 8 != 0:
+            data[-1] >>= 8 - len(bits) % 8
+        return data